@@ -1,14 +1,18 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from flask import Flask, request
+from flask import Flask, g, request
 from flask_mongoengine import MongoEngine
+from pymongo import ReadPreference
 
 from example import documents, schemas
 from flask_mongorest import MongoRest, operators as ops
 from flask_mongorest.authentication import AuthenticationBase
 from flask_mongorest.methods import *
 from flask_mongorest.resources import Resource
-from flask_mongorest.views import ResourceView
+from flask_mongorest.stats import QueryShapeStats
+from flask_mongorest.views import BatchView, ResourceView
 
 app = Flask(__name__)
 
@@ -33,12 +37,54 @@ class UserResource(Resource):
     document = documents.User
     schema = schemas.User
     filters = {"datetime": [ops.Exact]}
+    sync_key = "email"
 
 
 @api.register()
 class UserView(ResourceView):
     resource = UserResource
-    methods = [Create, Update, Fetch, List, Delete]
+    methods = [Create, BulkCreate, Update, Patch, Fetch, List, Delete, BulkDelete, Sync]
+
+
+@api.register(name="restricted_sync_users", url="/restricted_sync_users/")
+class RestrictedSyncUserView(ResourceView):
+    resource = UserResource
+    methods = [Sync]
+
+    # Can only read (and sync) the first user
+    def has_read_permission(self, request, qs):
+        return qs.filter(email="1@b.com")
+
+
+class NoReloadUserResource(UserResource):
+    reload_after_save = False
+
+
+@api.register(name="no_reload_users", url="/no_reload_users/")
+class NoReloadUserView(ResourceView):
+    resource = NoReloadUserResource
+    methods = [Update]
+
+
+class LimitedBulkUserResource(UserResource):
+    bulk_create_limit = 1
+    bulk_delete_limit = 1
+
+
+@api.register(name="limited_bulk_users", url="/limited_bulk_users/")
+class LimitedBulkUserView(ResourceView):
+    resource = LimitedBulkUserResource
+    methods = [BulkCreate, BulkDelete]
+
+
+class NoDeleteRulesUserResource(UserResource):
+    bulk_delete_rules = False
+
+
+@api.register(name="no_delete_rules_users", url="/no_delete_rules_users/")
+class NoDeleteRulesUserView(ResourceView):
+    resource = NoDeleteRulesUserResource
+    methods = [BulkDelete]
 
 
 class ContentResource(Resource):
@@ -88,7 +134,70 @@ class PostResource(Resource):
 @api.register(name="posts", url="/posts/")
 class PostView(ResourceView):
     resource = PostResource
-    methods = [Create, Update, BulkUpdate, Fetch, List, Delete]
+    methods = [Create, Update, Patch, BulkUpdate, Fetch, List, Delete]
+
+
+class UnsavedPostResource(PostResource):
+    # Fails any save, e.g. of objects which didn't change
+    def save_object(self, obj, **kwargs):
+        raise AssertionError("Unchanged objects shouldn't be saved")
+
+
+@api.register(name="unsaved_posts", url="/unsaved_posts/")
+class UnsavedPostView(ResourceView):
+    resource = UnsavedPostResource
+    methods = [Update]
+
+
+class StatsPostResource(PostResource):
+    query_stats = QueryShapeStats()
+
+
+@api.register(name="stats_posts", url="/stats_posts/")
+class StatsPostView(ResourceView):
+    resource = StatsPostResource
+    methods = [List]
+
+
+@api.register(name="user_posts", url="/posts/")
+class UserPostView(ResourceView):
+    resource = PostResource
+    methods = [Fetch, List]
+    parent = UserView
+    parent_field = "author"
+
+
+class SyncedPostResource(PostResource):
+    sync_key = "title"
+
+
+@api.register(name="user_post_writes", url="/writable_posts/")
+class UserPostWriteView(ResourceView):
+    resource = SyncedPostResource
+    methods = [Create, BulkCreate, Update, Fetch, List, Sync]
+    parent = UserView
+    parent_field = "author"
+
+
+class InPlaceUserResource(Resource):
+    document = documents.User
+    schema = schemas.User
+    filters = {"email": [ops.In]}
+    bulk_update_in_place = True
+    bulk_update_limit = 3
+
+
+@api.register(name="in_place_users", url="/in_place_users/")
+class InPlaceUserView(ResourceView):
+    resource = InPlaceUserResource
+    methods = [BulkUpdate, Fetch, List]
+
+
+@api.register(name="restricted_in_place_users", url="/restricted_in_place_users/")
+class RestrictedInPlaceUserView(InPlaceUserView):
+    # Can only read (and update) the first user
+    def has_read_permission(self, request, qs):
+        return qs.filter(email="1@b.com")
 
 
 class LimitedPostResource(Resource):
@@ -102,6 +211,70 @@ class LimitedPostView(ResourceView):
     methods = [Create, Update, Fetch, List]
 
 
+class DeadlinePostResource(Resource):
+    document = documents.Post
+    max_time_ms = 1000
+    deadline_header = "X-Deadline-Ms"
+    partial_results = True
+
+
+@api.register(name="deadline_posts", url="/deadline_posts/")
+class DeadlinePostView(ResourceView):
+    resource = DeadlinePostResource
+    methods = [Fetch, List]
+
+
+class ReadPreferencePostResource(Resource):
+    document = documents.Post
+    read_preference = ReadPreference.SECONDARY_PREFERRED
+    read_preferences = {Fetch: ReadPreference.PRIMARY_PREFERRED}
+    consistency_token_header = "X-Consistency-Token"
+
+
+@api.register(name="read_preference_posts", url="/read_preference_posts/")
+class ReadPreferencePostView(ResourceView):
+    resource = ReadPreferencePostResource
+    methods = [Create, Update, Fetch, List]
+
+
+class CompoundPostResource(Resource):
+    document = documents.Post
+    fields = ["id", "title", "author", "editor"]
+    related_resources = {"author": UserResource, "editor": UserResource}
+    compound_documents = True
+
+
+@api.register(name="compound_posts", url="/compound_posts/")
+class CompoundPostView(ResourceView):
+    resource = CompoundPostResource
+    methods = [List]
+
+
+class ActivityResource(Resource):
+    document = documents.Activity
+    fields = ["id", "note"]
+    child_document_resources = {
+        documents.Comment: "CommentResource",
+        documents.Call: "CallResource",
+    }
+
+
+class CommentResource(ActivityResource):
+    document = documents.Comment
+    fields = ["id", "text"]
+
+
+class CallResource(ActivityResource):
+    document = documents.Call
+    fields = ["id", "duration"]
+
+
+@api.register(name="activities", url="/activities/")
+class ActivityView(ResourceView):
+    resource = ActivityResource
+    methods = [Fetch, List]
+
+
 class DummyAuthenication(AuthenticationBase):
     def authorized(self):
         return False
@@ -121,7 +294,8 @@ class RestrictedPostView(ResourceView):
     """
 
     resource = PostResource
-    methods = [Create, Update, Fetch, List, Delete]
+    methods = [Create, Update, Fetch, List, Delete, Patch, BulkDelete]
+    permission_fields = ["is_published"]
 
     # Can't read a post if it isn't published
     def has_read_permission(self, request, qs):
@@ -189,6 +363,43 @@ class PersonView(ResourceView):
     methods = [Create, Update, Fetch, List]
 
 
+class BulkPersonResource(PersonResource):
+    bulk_save_related = True
+    # Operation types of each bulk_write
+    writes = []
+
+    def bulk_write(self, operations, ordered=True, document=None):
+        self.writes.append([type(operation).__name__ for operation in operations])
+        return super(BulkPersonResource, self).bulk_write(
+            operations, ordered, document
+        )
+
+
+@api.register(name="bulk_person", url="/bulk_person/")
+class BulkPersonView(ResourceView):
+    resource = BulkPersonResource
+    methods = [Create, Update, Fetch, List]
+
+
+class SavingLanguageResource(LanguageResource):
+    # Names of the languages saved one by one
+    saved = []
+
+    def save_object(self, obj, **kwargs):
+        self.saved.append(obj.name)
+        obj.save()
+
+
+class SavingBulkPersonResource(BulkPersonResource):
+    related_resources = {"languages": SavingLanguageResource}
+
+
+@api.register(name="saving_bulk_person", url="/saving_bulk_person/")
+class SavingBulkPersonView(ResourceView):
+    resource = SavingBulkPersonResource
+    methods = [Update]
+
+
 # extra resources for testing max_limit
 class Post10Resource(PostResource):
     max_limit = 10
@@ -225,6 +436,13 @@ class C(db.Document):
     txt = db.StringField()
 
 
+# Document with a default ordering, referencing A
+class D(db.Document):
+    meta = {"ordering": ["-txt"]}
+    ref = db.ReferenceField(A)
+    txt = db.StringField()
+
+
 class AResource(Resource):
     document = A
 
@@ -344,6 +562,49 @@ class DictDocView(ResourceView):
     methods = [Fetch, List, Create, Update]
 
 
+class LimitedBatchView(BatchView):
+    max_requests = 10
+
+
+api.register_batch(LimitedBatchView)
+
+
+class BatchUserResource(UserResource):
+    def get_objects(self, **kwargs):
+        # Can be slowed down, and counts the requests sharing the same `g`
+        time.sleep(float(self.params.get("sleep", 0)))
+        g.requests = getattr(g, "requests", 0) + 1
+        qs, has_more = super(BatchUserResource, self).get_objects(**kwargs)
+        return qs, has_more, {"requests": g.requests}
+
+
+@api.register(name="batch_users", url="/batch_users/")
+class BatchUserView(ResourceView):
+    resource = BatchUserResource
+    methods = [List]
+
+
+class FailingUserResource(UserResource):
+    def get_object(self, pk, qfilter=None):
+        raise RuntimeError("Failure")
+
+
+@api.register(name="failing_users", url="/failing_users/")
+class FailingUserView(ResourceView):
+    resource = FailingUserResource
+    methods = [Fetch]
+
+
+class ConcurrentBatchView(BatchView):
+    executor = ThreadPoolExecutor(max_workers=2)
+    timeout = 0.5
+
+
+api.register_batch(
+    ConcurrentBatchView, url="/concurrent_batch/", name="concurrent_batch"
+)
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
     app.run(host="0.0.0.0", port=port)
@@ -23,6 +23,13 @@ class User(Document):
     datetime_local = DateTimeField()
     balance = IntField()  # in cents
 
+    def posts(self):
+        return Post.objects(author=self).order_by("title")
+
+    def named_posts(self):
+        # Posts titled after the user's last name
+        return Post.objects(author=self, title=self.last_name)
+
 
 class Content(EmbeddedDocument):
     text = StringField()
@@ -45,3 +52,17 @@ class Post(Document):
 
     def primary_user(self):
         return self.user_lists[0] if self.user_lists else None
+
+
+class Activity(Document):
+    meta = {"allow_inheritance": True}
+    user = ReferenceField(User, reverse_delete_rule=CASCADE)
+    note = StringField()
+
+
+class Comment(Activity):
+    text = StringField()
+
+
+class Call(Activity):
+    duration = IntField()
@@ -18,5 +18,9 @@ class ValidationError(MongoRestException):
     pass
 
 
+class QueryTimeout(MongoRestException):
+    pass
+
+
 class UnknownFieldError(Exception):
     pass
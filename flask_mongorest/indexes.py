@@ -0,0 +1,246 @@
+"""
+Flask-MongoRest index advisor.
+
+Compares the filters and orderings that resources expose to the indexes
+that exist on their collections, so that a filter shipped without an index
+doesn't quietly turn into a collection scan:
+
+    report = api.check_indexes()
+
+returns, for each collection, the indexes required by the resources'
+`filters` and `allowed_ordering` that are missing, and the existing indexes
+that none of them use. Missing indexes can optionally be created.
+
+Note that the advisor only knows about what resources declare: indexes used
+by custom querysets or read permission filters will be reported as unused,
+and unique and TTL indexes are never reported as unused.
+
+Resources can also opt into a strict mode (see `Resource.index_strict_mode`)
+which explains a sample of the queries they run and logs or rejects the
+ones examining far more documents than they return.
+"""
+
+import logging
+import random
+
+from flask_mongorest import operators
+from flask_mongorest.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def _db_field(document, field):
+    """
+    Return the dotted database path of a (possibly `__` separated lookup)
+    field name, or None if it can't be resolved.
+    """
+    try:
+        fields = document._lookup_field(field.split("__"))
+    except Exception:
+        return None
+    return ".".join(f if isinstance(f, str) else f.db_field for f in fields)
+
+
+def _ordering_keys(document, resource, ordering):
+    keys = []
+    for field in ordering.split(","):
+        direction = 1
+        if field.startswith("-"):
+            direction = -1
+        field = field.lstrip("+-")
+        db_field = _db_field(
+            document, resource._reverse_rename_fields.get(field, field)
+        )
+        if db_field is None:
+            return None
+        keys.append((db_field, direction))
+    return keys
+
+
+def get_required_indexes(resource):
+    """
+    Return a list of index specs required by a resource instance's filters
+    and allowed orderings. Each spec is a dict with the index `keys` (a
+    list of `(field, direction)` tuples), an optional `collation` and a
+    human-readable `reason`.
+
+    A filter requires an index with the filtered field as its prefix, and an
+    ordering requires an index with the sort keys (or their reverse) as its
+    prefix, optionally preceded by fields the resource filters on.
+    """
+    document = resource.document
+    required = []
+    seen = set()
+
+    def add(keys, reason, collation=None):
+        key = (tuple(keys), tuple(sorted((collation or {}).items())))
+        if key not in seen:
+            seen.add(key)
+            required.append({"keys": keys, "collation": collation, "reason": reason})
+
+    for field, allowed_operators in resource._filters.items():
+        db_field = _db_field(
+            document, resource._reverse_rename_fields.get(field, field)
+        )
+        if db_field is None or db_field == "_id":
+            continue
+        for operator in allowed_operators.values():
+            operator = operator()
+            if isinstance(operator, operators.Search):
+                add([(db_field, "text")], f"text search on '{field}'")
+            elif isinstance(operator, operators.CollationOperator):
+                add(
+                    [(db_field, 1)],
+                    f"filter on '{field}'",
+                    collation=operator.collation,
+                )
+            else:
+                add([(db_field, 1)], f"filter on '{field}'")
+
+    for ordering in resource.allowed_ordering:
+        keys = _ordering_keys(document, resource, ordering)
+        if keys and keys != [("_id", 1)] and keys != [("_id", -1)]:
+            add(keys, f"ordering by '{ordering}'")
+
+    return required
+
+
+def _collation_matches(required, existing):
+    # Queries without a collation can only use indexes without one.
+    if not required:
+        return not existing or existing.get("locale") == "simple"
+    existing = existing or {}
+    return all(existing.get(k) == v for k, v in required.items())
+
+
+def _is_text(keys):
+    return any(direction == "text" for _, direction in keys)
+
+
+def _covers(info, keys, prefix_fields):
+    """
+    Whether an index can serve a query on `keys`, i.e. `keys` (or their
+    reverse) follow zero or more of `prefix_fields` in the index. A text
+    search is served by a text index including the searched field.
+    """
+    if _is_text(keys):
+        return keys[0][0] in info.get("weights", {})
+    index_keys = [(k, d) for k, d in info["key"]]
+    reverse = [(k, -d) for k, d in keys]
+    for start in range(len(index_keys)):
+        candidate = index_keys[start : start + len(keys)]
+        if candidate in (keys, reverse):
+            return True
+        # A single field filter doesn't care about the direction
+        if len(keys) == 1 and candidate[0][0] == keys[0][0]:
+            return True
+        if index_keys[start][0] not in prefix_fields:
+            break
+    return False
+
+
+def _create_indexes(collection, missing):
+    # A collection can only have one text index, so all the searched fields
+    # go into a single one.
+    text_keys = [spec["keys"][0] for spec in missing if _is_text(spec["keys"])]
+    if text_keys:
+        collection.create_index(text_keys, background=True)
+    for spec in missing:
+        if _is_text(spec["keys"]):
+            continue
+        kwargs = {}
+        if spec["collation"]:
+            kwargs["collation"] = spec["collation"]
+        collection.create_index(spec["keys"], background=True, **kwargs)
+
+
+def get_index_report(resources, create_missing=False):
+    """
+    Compare the indexes required by the given Resource classes with the
+    indexes of their collections, and return a dict mapping collection names
+    to `{'missing': [index specs], 'unused': [index names]}`. If
+    `create_missing` is set, missing indexes get created (and are still
+    listed in the report).
+    """
+    collections = {}
+    for resource_class in resources:
+        resource = resource_class()
+        collection = resource.document._get_collection()
+        entry = collections.setdefault(
+            collection.name, {"collection": collection, "required": []}
+        )
+        entry["required"].extend(get_required_indexes(resource))
+
+    report = {}
+    for name, entry in collections.items():
+        collection = entry["collection"]
+        index_information = collection.index_information()
+        filtered_fields = {
+            spec["keys"][0][0]
+            for spec in entry["required"]
+            if len(spec["keys"]) == 1 and not _is_text(spec["keys"])
+        }
+
+        missing = []
+        used = set()
+        for spec in entry["required"]:
+            covering = [
+                index_name
+                for index_name, info in index_information.items()
+                if _covers(info, spec["keys"], filtered_fields)
+                and _collation_matches(spec["collation"], info.get("collation"))
+            ]
+            used.update(covering)
+            if not covering and spec not in missing:
+                missing.append(spec)
+
+        unused = [
+            index_name
+            for index_name, info in index_information.items()
+            if index_name != "_id_"
+            and index_name not in used
+            and not info.get("unique")
+            and "expireAfterSeconds" not in info
+        ]
+
+        if create_missing and missing:
+            _create_indexes(collection, missing)
+
+        report[name] = {"missing": missing, "unused": unused}
+
+    return report
+
+
+def check_query_plan(resource, qs):
+    """
+    Explain a sample of the queries run by a resource in strict index mode,
+    and log or reject (depending on `resource.index_strict_mode`) the ones
+    whose plan examines far more documents than it returns. Return the
+    number of examined documents if the query was explained.
+
+    The explain runs on the request path, so the queryset should already be
+    limited by the request's time budget and routed according to its read
+    preference (see `Resource.apply_time_budget` and
+    `Resource.apply_read_preference`).
+    """
+    if not resource.index_strict_mode:
+        return None
+    if random.random() >= resource.index_strict_sample_rate:
+        return None
+
+    stats = qs.explain().get("executionStats", {})
+    examined = stats.get("totalDocsExamined", 0)
+    returned = stats.get("nReturned", 0)
+    if examined <= resource.index_strict_max_ratio * max(returned, 1):
+        return examined
+
+    message = (
+        f"Query on {resource.document.__name__} examined {examined} documents "
+        f"to return {returned}: {qs._query}"
+    )
+    logger.warning(message)
+    if resource.index_strict_mode == "reject":
+        raise ValidationError(
+            {"error": "This combination of filters and ordering isn't supported."}
+        )
+    return examined
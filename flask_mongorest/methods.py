@@ -5,6 +5,10 @@ class Create:
     method = "POST"
 
 
+class BulkCreate:
+    method = "POST"
+
+
 class Update:
     method = "PUT"
 
@@ -25,12 +29,28 @@ class Delete:
     method = "DELETE"
 
 
+class BulkDelete:
+    method = "DELETE"
+
+
+class Patch:
+    method = "PATCH"
+
+
+class Sync:
+    method = "POST"
+
+
 # type alias
 METHODS_TYPE = typing.Union[
     typing.Type[Create],
+    typing.Type[BulkCreate],
     typing.Type[Update],
     typing.Type[BulkUpdate],
     typing.Type[Fetch],
     typing.Type[List],
     typing.Type[Delete],
+    typing.Type[BulkDelete],
+    typing.Type[Patch],
+    typing.Type[Sync],
 ]
@@ -1,8 +1,14 @@
+import logging
 from typing import Union
 
 from flask import Blueprint, Flask
 
 from flask_mongorest import BulkUpdate, Create, List
+from flask_mongorest.indexes import get_index_report
+from flask_mongorest.methods import BulkCreate, BulkDelete, Sync
+from flask_mongorest.views import BatchView
+
+logger = logging.getLogger(__name__)
 
 
 class DelayedApp:
@@ -17,14 +23,18 @@ class DelayedApp:
         self.url_rules.append((args, kwargs))
 
 
+def get_default_url(klass):
+    document_name = klass.resource.document.__name__.lower()
+    return f"/{document_name}/"
+
+
 def register_class(app: Union[DelayedApp, Flask], klass, *, url_prefix, **kwargs):
     # Construct a url based on a 'name' kwarg with a fallback to the
     # view's class name. Note that the name must be unique.
     name = kwargs.pop("name", klass.__name__)
     url = kwargs.pop("url", None)
     if not url:
-        document_name = klass.resource.document.__name__.lower()
-        url = f"/{document_name}/"
+        url = get_default_url(klass)
 
     # Insert the url prefix, if it exists
     if url_prefix:
@@ -41,17 +51,32 @@ def register_class(app: Union[DelayedApp, Flask], klass, *, url_prefix, **kwargs
             methods=[List.method],
             **kwargs,
         )
-    if Create in klass.methods or BulkUpdate in klass.methods:
+    collection_methods = (Create, BulkCreate, BulkUpdate, BulkDelete)
+    if any(x in klass.methods for x in collection_methods):
         app.add_url_rule(
             url,
             view_func=view_func,
-            methods=[x.method for x in klass.methods if x in (Create, BulkUpdate)],
+            methods=sorted(
+                {x.method for x in klass.methods if x in collection_methods}
+            ),
+            **kwargs,
+        )
+    if Sync in klass.methods:
+        app.add_url_rule(
+            f"{url}sync/",
+            defaults={"sync": True},
+            view_func=view_func,
+            methods=[Sync.method],
             **kwargs,
         )
     app.add_url_rule(
         f"{url}<{pk_type}:pk>/",
         view_func=view_func,
-        methods=[x.method for x in klass.methods if x not in (List, BulkUpdate)],
+        methods=[
+            x.method
+            for x in klass.methods
+            if x not in (List, BulkCreate, BulkUpdate, BulkDelete, Sync)
+        ],
         **kwargs,
     )
 
@@ -62,6 +87,8 @@ class MongoRest:
         self.template_folder = template_folder
         self._delayed_app = DelayedApp()
         self._registered_apps = []
+        self._registered_views = []
+        self._view_urls = {}
 
         if app is not None:
             self.init_app(app)
@@ -82,9 +109,75 @@ class MongoRest:
         self._registered_apps.append(app)
 
     def register(self, **kwargs):
+        """
+        Register a view. If the view has a `parent` view (which must be
+        registered first), its URLs are nested under the parent object's
+        URL, e.g. `/user/<parent_pk>/posts/`.
+        """
+
         def decorator(klass):
+            # Sync requests look up their objects by the resource's sync key
+            resource = klass.resource
+            if Sync in klass.methods and (
+                resource.sync_key not in resource.document._fields
+            ):
+                raise ValueError(
+                    f"{klass.__name__} allows Sync, so {resource.__name__}.sync_key "
+                    f"must be a field of {resource.document.__name__}"
+                )
+            url = kwargs.get("url") or get_default_url(klass)
+            parent = getattr(klass, "parent", None)
+            if parent is not None:
+                if parent not in self._view_urls:
+                    raise ValueError(
+                        f"{parent.__name__} must be registered before {klass.__name__}"
+                    )
+                parent_url, parent_pk_type = self._view_urls[parent]
+                url = f"{parent_url}<{parent_pk_type}:parent_pk>{url}"
+            self._view_urls[klass] = (url, kwargs.get("pk_type", "string"))
+
             for app in [self._delayed_app] + self._registered_apps:
-                register_class(app, klass, url_prefix=self.url_prefix, **kwargs)
+                register_class(
+                    app, klass, url_prefix=self.url_prefix, **dict(kwargs, url=url)
+                )
+            self._registered_views.append(klass)
             return klass
 
         return decorator
+
+    def register_batch(self, klass=BatchView, url="/batch/", name="batch"):
+        """
+        Register an endpoint executing a list of sub-requests to the
+        registered views in a single request. Pass a `BatchView` subclass to
+        configure it (e.g. its `max_requests` or `executor`).
+        """
+        view_func = klass.as_view(name)
+        for app in [self._delayed_app] + self._registered_apps:
+            app.add_url_rule(
+                f"{self.url_prefix}{url}", view_func=view_func, methods=["POST"]
+            )
+        return klass
+
+    def check_indexes(self, create_missing=False):
+        """
+        Check that the filters and orderings of all the registered resources
+        are backed by indexes, log a warning for each missing index and
+        return a report of the missing and unused indexes per collection.
+        Missing indexes are created if `create_missing` is set. See
+        `flask_mongorest.indexes`.
+        """
+        resources = []
+        for view in self._registered_views:
+            if view.resource not in resources:
+                resources.append(view.resource)
+
+        report = get_index_report(resources, create_missing=create_missing)
+        for collection, entry in report.items():
+            for spec in entry["missing"]:
+                logger.warning(
+                    "Missing index on %s %s for %s",
+                    collection,
+                    spec["keys"],
+                    spec["reason"],
+                )
+        return report
@@ -47,8 +47,37 @@ Then you include it in your Resource's filters:
 And this way, the request we mentioned above would result in:
 
     Student.objects.filter(score__lte=upper, score__gte=lower)
+
+Operators can also implement `prepare_raw_query`, which returns a raw
+MongoDB query fragment instead of queryset kwargs. Resources combine these
+fragments into a single `__raw__` query, which saves MongoEngine from
+parsing the kwargs and looking up the fields again on every request. The
+Range operator above could implement it like so:
+
+        def prepare_raw_query(self, field, value, negate, coerce):
+            lower, upper = value.split(',')
+            return {
+                field: {'$gte': coerce('gte', lower), '$lte': coerce('lte', upper)}
+            }
+
+Where `field` is the name of the field in the database and `coerce`
+converts a value to its MongoDB representation for the given MongoEngine
+operator name. Operators which override `prepare_queryset_kwargs` (or
+`apply`) without also overriding `prepare_raw_query` keep using the
+queryset kwargs.
 """
 
+from mongoengine.queryset.transform import STRING_OPERATORS
+
+from flask_mongorest.exceptions import ValidationError
+
+# Operators which are simply translated to a "$<op>" MongoDB operator.
+COMPARISON_OPERATORS = ("ne", "lt", "lte", "gt", "gte")
+
+# Collation used by the collation-aware case-insensitive operators. An index
+# has to be created with the same collation for MongoDB to use it.
+CASE_INSENSITIVE_COLLATION = {"locale": "en", "strength": 2}
+
 
 class Operator:
     """Base class that all the other operators should inherit from."""
@@ -58,6 +87,24 @@ class Operator:
     # Can be overridden via constructor.
     allow_negation = False
 
+    # Whether `prepare_raw_query` can be used instead of
+    # `prepare_queryset_kwargs`. See __init_subclass__.
+    raw_query = True
+
+    # Whether the operator compares string values in a way which depends on
+    # the query's collation (see CollationOperator). Regular expressions and
+    # text searches don't.
+    collation_sensitive = True
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "raw_query" in cls.__dict__:
+            return
+        if "prepare_raw_query" in cls.__dict__:
+            cls.raw_query = True
+        elif "prepare_queryset_kwargs" in cls.__dict__ or "apply" in cls.__dict__:
+            cls.raw_query = False
+
     def __init__(self, allow_negation=False):
         self.allow_negation = allow_negation
 
@@ -72,6 +119,30 @@ class Operator:
         else:
             return {"__".join(filter(None, [field, self.op])): value}
 
+    def prepare_queryset(self, queryset):
+        """
+        Return the queryset with any options this operator's filter relies
+        on (e.g. a collation) applied. Called for each filter using this
+        operator, regardless of how the filter itself is applied.
+        """
+        return queryset
+
+    def prepare_raw_query(self, field, value, negate, coerce):
+        """
+        Return a raw MongoDB query fragment equivalent to the kwargs returned
+        by `prepare_queryset_kwargs`, or None if the operator can't be
+        expressed as one (in which case the queryset kwargs are used).
+        """
+        if self.op in STRING_OPERATORS:
+            value = coerce(self.op, value)
+        elif self.op in COMPARISON_OPERATORS:
+            value = {f"${self.op}": coerce(self.op, value)}
+        else:
+            return None
+        if negate:
+            value = {"$not": value}
+        return {field: value}
+
     def apply(self, queryset, field, value, negate=False):
         kwargs = self.prepare_queryset_kwargs(field, value, negate)
         return queryset.filter(**kwargs)
@@ -108,9 +179,16 @@ class Exact(Operator):
         else:
             return {field: value}
 
+    def prepare_raw_query(self, field, value, negate, coerce):
+        if negate:
+            return {field: {"$ne": coerce("ne", value)}}
+        else:
+            return {field: coerce(None, value)}
+
 
 class IExact(Operator):
     op = "iexact"
+    collation_sensitive = False
 
 
 class In(Operator):
@@ -129,33 +207,50 @@ class In(Operator):
             op = negate and "ne" or ""
         return {"__".join(filter(None, [field, op])): value}
 
+    def prepare_raw_query(self, field, value, negate, coerce):
+        value = value or []
+        if "," in value:
+            op = negate and "nin" or self.op
+            return {field: {f"${op}": [coerce(op, v) for v in value.split(",")]}}
+        elif negate:
+            return {field: {"$ne": coerce("ne", value)}}
+        else:
+            return {field: coerce(None, value)}
+
 
 class Contains(Operator):
     op = "contains"
+    collation_sensitive = False
 
 
 class IContains(Operator):
     op = "icontains"
+    collation_sensitive = False
 
 
 class Startswith(Operator):
     op = "startswith"
+    collation_sensitive = False
 
 
 class IStartswith(Operator):
     op = "istartswith"
+    collation_sensitive = False
 
 
 class Endswith(Operator):
     op = "endswith"
+    collation_sensitive = False
 
 
 class IEndswith(Operator):
     op = "iendswith"
+    collation_sensitive = False
 
 
 class Boolean(Operator):
     op = "exact"
+    collation_sensitive = False
 
     def prepare_queryset_kwargs(self, field, value, negate):
         if value == "false":
@@ -167,3 +262,137 @@ class Boolean(Operator):
             bool_value = not bool_value
 
         return {field: bool_value}
+
+    def prepare_raw_query(self, field, value, negate, coerce):
+        bool_value = value != "false"
+        if negate:
+            bool_value = not bool_value
+        return {field: coerce(None, bool_value)}
+
+
+class CollationOperator(Operator):
+    """
+    Base class for case-insensitive operators which match values using a
+    collation instead of a case-insensitive regular expression, so that
+    MongoDB can use an index created with the same collation rather than
+    scanning the whole collection.
+
+    The collation and the name of the index to use (if MongoDB shouldn't
+    choose it on its own) can be declared per resource:
+
+        filters = {
+            'name': [
+                operators.CollatedIExact(index='name_ci'),
+                operators.CollatedIStartswith(index='name_ci'),
+            ]
+        }
+
+    Note that MongoDB applies a collation to the whole query, i.e. to all
+    its string comparisons and to its sort. Requests combining a collated
+    filter with other (non regular expression) filters on string fields, or
+    with an ordering by a string field, are therefore rejected, as these
+    would silently become case-insensitive too. This includes the string
+    conditions and ordering of the queryset the filters are applied to,
+    e.g. those of a view's `has_read_permission` or of a nested view's
+    parent filter.
+    """
+
+    collation = CASE_INSENSITIVE_COLLATION
+
+    # Name (or spec) of the index to hint
+    index = None
+
+    def __init__(self, allow_negation=False, collation=None, index=None):
+        super().__init__(allow_negation)
+        if collation is not None:
+            self.collation = collation
+        if index is not None:
+            self.index = index
+
+    def prepare_queryset(self, queryset):
+        # A query can only use a single collation.
+        if queryset._collation not in (None, self.collation):
+            raise ValidationError(
+                {"error": "These filters can't be combined in a single query."}
+            )
+        queryset = queryset.collation(self.collation)
+
+        # Keep the first hint if filters on multiple fields provide one.
+        if self.index and queryset._hint in (-1, None):
+            queryset = queryset.hint(self.index)
+        return queryset
+
+
+class CollatedIExact(CollationOperator, Exact):
+    op = "iexact"
+
+
+class CollatedIStartswith(CollationOperator):
+    """
+    Match a case-insensitive prefix with a range query, which, unlike a
+    regular expression, can use a case-insensitive collation index.
+    """
+
+    op = "istartswith"
+
+    # With the CLDR root collation (which all locales are based on),
+    # U+FFFF has the highest primary weight, so it sorts after any string
+    # starting with the prefix.
+    UPPER_BOUND_SUFFIX = "\uffff"
+
+    def prepare_queryset_kwargs(self, field, value, negate):
+        value = value or ""
+        if negate:
+            return {
+                f"{field}__not": {"$gte": value, "$lt": value + self.UPPER_BOUND_SUFFIX}
+            }
+        else:
+            return {
+                f"{field}__gte": value,
+                f"{field}__lt": value + self.UPPER_BOUND_SUFFIX,
+            }
+
+    def prepare_raw_query(self, field, value, negate, coerce):
+        value = value or ""
+        value = {
+            "$gte": coerce("gte", value),
+            "$lt": coerce("lt", value + self.UPPER_BOUND_SUFFIX),
+        }
+        if negate:
+            value = {"$not": value}
+        return {field: value}
+
+
+class Search(Operator):
+    """
+    Full text search using the collection's text index, e.g.
+
+        GET /post/?title__search=john
+
+    Note that the field name only determines the name of the param: the
+    search covers all the fields in the text index. If `order_by_score` is
+    set, results are ordered by relevance unless the request asks for a
+    different ordering.
+    """
+
+    op = "search"
+    collation_sensitive = False
+
+    def __init__(self, language=None, order_by_score=False):
+        super().__init__()
+        self.language = language
+        self.order_by_score = order_by_score
+
+    def apply(self, queryset, field, value, negate=False):
+        if not value:
+            return queryset
+        if queryset._search_text:
+            raise ValidationError(
+                {"error": "Only one full text search is allowed per query."}
+            )
+        queryset = queryset.search_text(
+            value, language=self.language, text_score=self.order_by_score
+        )
+        if self.order_by_score:
+            queryset = queryset.order_by("$text_score")
+        return queryset
@@ -1,12 +1,17 @@
+import concurrent.futures
 import contextlib
+import functools
 import json
-from typing import Dict, List, Type
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
 from urllib.parse import urlparse
 
 import mongoengine
 from bson.dbref import DBRef
 from bson.objectid import ObjectId
-from flask import has_request_context, request, url_for
+from flask import copy_current_request_context, has_request_context, request, url_for
+from pymongo import InsertOne, ReadPreference, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, ExecutionTimeout
 
 try:  # closeio/mongoengine
     from mongoengine.base.proxy import DocumentProxy
@@ -15,18 +20,136 @@ except ImportError:
     DocumentProxy = None
     SafeReferenceField = None
 
-from cleancat import ValidationError as SchemaValidationError
+from cleancat import StopValidation, ValidationError as SchemaValidationError
+from mongoengine.base import get_document
 from mongoengine.fields import (
+    CachedReferenceField,
+    DecimalField,
     DictField,
     EmbeddedDocumentField,
+    FloatField,
     GenericReferenceField,
+    IntField,
     ListField,
+    LongField,
     ReferenceField,
+    StringField,
 )
 
 from flask_mongorest import methods
-from flask_mongorest.exceptions import UnknownFieldError, ValidationError
-from flask_mongorest.utils import cmp_fields, equal, isbound, isint
+from flask_mongorest.exceptions import QueryTimeout, UnknownFieldError, ValidationError
+from flask_mongorest.indexes import check_query_plan
+from flask_mongorest.operators import CollationOperator
+from flask_mongorest.stats import query_shape
+from flask_mongorest.utils import (
+    equal,
+    field_comparator,
+    isbound,
+    isint,
+    merge_raw_query,
+    parse_fields,
+    query_value_coercer,
+    reference_id,
+    server_version,
+)
+
+# Update operators supported by PATCH requests, mapped to MongoEngine's
+# update keywords
+PATCH_OPERATORS = {
+    "$set": "set",
+    "$unset": "unset",
+    "$inc": "inc",
+    "$push": "push",
+    "$pull": "pull",
+    "$addToSet": "add_to_set",
+}
+
+
+def _sort_key(value):
+    # Like MongoDB, sort None before any other value
+    return (value is not None, value)
+
+
+class IncludedObjects(dict):
+    """
+    The `included` map of a compound document (see `compound_documents`),
+    mapping document types to the related objects serialized so far by id.
+    It also remembers the shape each object was serialized in, i.e. its
+    related resource and nested field selection.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.shapes = {}
+
+
+class _PlaceholderValue:
+    """
+    A field value of the placeholder objects used to find out which query a
+    related field's method runs (see `Resource._get_reverse_lookup`).
+    """
+
+
+def _related_order_by(document, qs):
+    """
+    Return the ordering of a queryset of related objects (or the default
+    ordering of their document) as a list of `order_by` style keys.
+    """
+    ordering = qs._ordering or qs._get_order_by(document._meta["ordering"])
+    return [
+        ("-" if direction < 0 else "") + document._reverse_db_field_map.get(key, key)
+        for key, direction in ordering
+    ]
+
+
+def _related_sort(document, qs):
+    """
+    Return the `$sort` spec of a queryset of related objects, sorting them
+    by id if they aren't ordered.
+    """
+    ordering = qs._ordering or qs._get_order_by(document._meta["ordering"])
+    return dict(ordering) or {"_id": 1}
+
+
+def _has_string_condition(query):
+    """
+    Whether a MongoDB query compares a field to a string, i.e. whether a
+    collation could change its results. The class names of the `_cls`
+    condition of inherited documents are left out.
+    """
+    if isinstance(query, str):
+        return True
+    if isinstance(query, dict):
+        return any(
+            _has_string_condition(value)
+            for key, value in query.items()
+            if key not in ("_cls", "$regex", "$options", "$type")
+        )
+    if isinstance(query, (list, tuple)):
+        return any(_has_string_condition(value) for value in query)
+    return False
+
+
+def _db_projection(document, fields):
+    """Return a `$project` spec of a document's given fields."""
+    projection = {document._fields[field].db_field: 1 for field in fields}
+    if document._meta.get("allow_inheritance"):
+        projection["_cls"] = 1
+    return projection
+
+
+def _sort_documents(documents, order_by):
+    """
+    Sort a list of documents in place by a list of `order_by` style keys,
+    one key at a time starting with the least significant one (sorting is
+    stable).
+    """
+    for key in reversed(order_by):
+        name = key.lstrip("-")
+        documents.sort(
+            key=lambda document: _sort_key(getattr(document, name)),
+            reverse=key.startswith("-"),
+        )
 
 
 class ResourceMeta(type):
@@ -70,6 +193,44 @@ class Resource(metaclass=ResourceMeta):
     # Maximum number of objects which can be bulk-updated by a single request
     bulk_update_limit = 1000
 
+    # Maximum number of objects which can be created by a single BulkCreate
+    # request
+    bulk_create_limit = 1000
+
+    # Field identifying the objects of a Sync request (a unique natural key,
+    # e.g. an external id), and maximum number of objects in such a request
+    sync_key: Optional[str] = None
+    sync_limit = 1000
+
+    # Maximum number of objects which can be deleted by a single BulkDelete
+    # request, and number of ids deleted per `delete_many`
+    bulk_delete_limit = 1000
+    bulk_delete_batch_size = 500
+
+    # Whether bulk deletes apply the `delete_rules` of the documents
+    # referencing this resource's document (e.g. `reverse_delete_rule=CASCADE`)
+    # and MongoEngine's delete signals. The rules are applied in bulk for each
+    # batch of ids. Otherwise, documents are deleted with raw `delete_many`
+    # calls.
+    bulk_delete_rules = True
+
+    # Whether bulk updates are applied with a single `update_many` (see
+    # `bulk_update_objects`) rather than by loading, validating and saving
+    # each object. Only enable it if the schema validates the payload
+    # independently of the objects, and if updating and saving objects
+    # doesn't involve any per-object logic. The view's read permission
+    # filter applies to the update. Views overriding `has_change_permission`
+    # should also override `has_patch_permission` to filter the queryset, as
+    # the objects are otherwise loaded to check it on each of them.
+    bulk_update_in_place = False
+
+    # Whether the related objects saved along with an object (see
+    # `get_save_related_fields`) are written with a single `bulk_write` per
+    # collection (see `bulk_save_objects`) rather than saved one by one. Only
+    # enable it if the related documents don't rely on MongoEngine's save
+    # signals, which aren't sent by bulk writes.
+    bulk_save_related = False
+
     # Map of field names and Resource classes that should be used to handle
     # these fields (for serialization, saving, etc.).
     related_resources: Dict[str, "Resource"] = {}
@@ -82,6 +243,50 @@ class Resource(metaclass=ResourceMeta):
     # dropped, or at least refactored
     related_resources_hints: Dict[str, str] = {}
 
+    # Maximum number of objects per query when prefetching the related
+    # resources in `related_resources_hints`
+    related_resources_chunk_size = 1000
+
+    # Whether MongoDB should sort prefetched related objects, e.g. because an
+    # index on the hint field followed by the ordering fields exists.
+    # Otherwise they're sorted in Python.
+    related_resources_server_ordering = False
+
+    # Map of field names in `related_resources_hints` to the maximum number
+    # of related objects to prefetch for each object, e.g. {'activities': 5}.
+    # The first ones in the related querysets' ordering are kept, and each
+    # object gets a `<field name>_has_more` attribute telling whether there
+    # are more (which can be serialized by listing it in `fields`). They're
+    # fetched with one limited query per object, which an index on the hint
+    # field followed by the ordering fields serves without reading the other
+    # related objects. These queries run concurrently in the
+    # `related_resources_executor`, if set.
+    related_resources_limits: Dict[str, int] = {}
+
+    # Executor (e.g. a concurrent.futures.ThreadPoolExecutor shared by all
+    # the resources of a worker process) used to prefetch the different
+    # fields in `related_resources_hints` concurrently. By default they're
+    # fetched one after the other.
+    related_resources_executor: Optional[concurrent.futures.Executor] = None
+
+    # Whether List requests can ask for a compound document with
+    # `_compound=1`. The related documents in `related_resources` are then
+    # serialized once into a top-level `included` map, keyed by document
+    # type and id, and the returned objects only reference them.
+    compound_documents = False
+
+    # Opt-in mode in which `get_objects` fetches a page and its requested
+    # related resources in a single aggregation, joining them with `$lookup`
+    # stages instead of running one extra query per related field. Only
+    # reverse relations in `related_resources_hints` and (non-DBRef)
+    # ReferenceFields in `related_resources` can be joined, others are still
+    # fetched separately. Joins with a sub-pipeline (filters, server-side
+    # ordering, limits or projections) require MongoDB 5.0+. On older
+    # servers, the related objects are joined whole and sorted and capped in
+    # Python, and reverse relations with other conditions than the hint
+    # field are fetched separately.
+    related_resources_lookup = False
+
     # List of field names corresponding to related resources. If a field is
     # mentioned here and in `related_resources`, it can be created/updated
     # from within this resource.
@@ -103,6 +308,75 @@ class Resource(metaclass=ResourceMeta):
     # Must start and end with a "/"
     uri_prefix = None
 
+    # Time budget (in milliseconds) of all the queries run while processing
+    # a single request, applied to each of them as maxTimeMS. None means no
+    # limit.
+    max_time_ms: Optional[int] = None
+
+    # Name of a request header through which clients can set the time budget
+    # (in milliseconds) of their request. It can't exceed `max_time_ms`.
+    deadline_header: Optional[str] = None
+
+    # Whether a List request exceeding its time budget should return the
+    # objects fetched so far, along with the params to continue from, rather
+    # than an error.
+    partial_results = False
+
+    # Extra time (in milliseconds) given to the prefetch of the related
+    # resources of a partial page, as the time budget is used up by then. If
+    # they can't be fetched in time either, an empty page is returned along
+    # with the params to continue from.
+    partial_results_grace_ms = 500
+
+    # Read preference of this resource's queries (e.g.
+    # `ReadPreference.SECONDARY_PREFERRED`). None means the connection's
+    # default is used.
+    read_preference = None
+
+    # Map of method classes to read preferences overriding `read_preference`
+    # for requests using that method, e.g.
+    #   {methods.List: ReadPreference.SECONDARY_PREFERRED}
+    read_preferences: Dict[methods.METHODS_TYPE, Any] = {}
+
+    # Read preference used when a client opts into stale-tolerant reads with
+    # `_consistency=eventual` (`_consistency=strong` reads from the primary).
+    eventual_read_preference = ReadPreference.SECONDARY_PREFERRED
+
+    # Name of a header through which a token is returned after each write.
+    # Clients passing the token back in the same header get their reads
+    # routed to the primary for `read_your_writes_window` seconds after their
+    # write, so that they can read it back even if secondaries lag behind.
+    consistency_token_header: Optional[str] = None
+    read_your_writes_window = 10
+
+    # Seconds by which the write time of a consistency token may be ahead of
+    # this server's clock (e.g. when it was issued by another server). Tokens
+    # further in the future are rejected.
+    consistency_token_skew = 1
+
+    # QueryShapeStats collector recording the shape, latency and row counts
+    # of the queries run by `get_objects` (see flask_mongorest.stats).
+    query_stats = None
+
+    # Map of query shapes to the index MongoDB should use for them. A shape
+    # is a tuple of the (sorted) document field names being filtered on and
+    # the `_order_by` param (or None), e.g.
+    #   {(('account', 'status'), '-date_created'): 'account_1_status_1_date_created_-1'}
+    index_hints: Dict[Tuple[Tuple[str, ...], Optional[str]], Any] = {}
+
+    # Opt-in strict index mode: explain a sample of the queries run by
+    # `get_objects` and either "log" or "reject" those which examine more than
+    # `index_strict_max_ratio` documents per returned document.
+    index_strict_mode: Optional[str] = None
+    index_strict_sample_rate = 0.01
+    index_strict_max_ratio = 100
+
+    # Whether saved objects are reloaded from the database, e.g. to pick up
+    # values set by signal handlers. Otherwise, the in-memory object is
+    # serialized in the response. Objects are never reloaded if the client
+    # asked for a minimal response (see `wants_minimal_response`).
+    reload_after_save = True
+
     def __init__(self, view_method=None):
         """
         Initialize a resource. Optionally, a method class can be given to
@@ -121,12 +395,24 @@ class Resource(metaclass=ResourceMeta):
             self._reverse_rename_fields
         ), "Cannot rename multiple fields to the same name"
         self._filters = self.get_filters()
+        self._filter_table, self._filter_prefixes = self.get_filter_table()
+        self._raw_query_fields = self.get_raw_query_fields()
+        self._field_comparators = self.get_field_comparators()
         self._child_document_resources = self.get_child_document_resources()
+        self._subresources = {}
+        self._serialization_plans = {}
         self._default_child_resource_document = (
             self.get_default_child_resource_document()
         )
         self.data = None
         self._dirty_fields = None
+        # Equality filters on the parent of a nested view's objects, e.g.
+        # `{"author": user}` for `/user/<parent_pk>/posts/`
+        self.parent_filter = None
+        self._query_filters = []
+        self._query_collated = False
+        self._query_ordering = None
+        self._start_time = time.monotonic()
         self.view_method = view_method
 
     @property
@@ -144,7 +430,7 @@ class Resource(metaclass=ResourceMeta):
             raise AttributeError
 
         if not hasattr(self, "_params"):
-            if "_params" in self.raw_data:
+            if isinstance(self.raw_data, dict) and "_params" in self.raw_data:
                 self._params = self.raw_data["_params"]
             else:
                 try:
@@ -196,7 +482,10 @@ class Resource(metaclass=ResourceMeta):
                     raise ValidationError(
                         {"error": "The request contains invalid JSON."}
                     )
-                if not isinstance(self._raw_data, dict):
+                if self.view_method in (methods.BulkCreate, methods.Sync):
+                    if not isinstance(self._raw_data, list):
+                        raise ValidationError({"error": "JSON data must be a list."})
+                elif not isinstance(self._raw_data, dict):
                     raise ValidationError({"error": "JSON data must be a dict."})
             else:
                 self._raw_data = {}
@@ -260,7 +549,7 @@ class Resource(metaclass=ResourceMeta):
             all_fields_set = set(fields) | set(self.get_optional_fields())
 
         if params and "_fields" in params:
-            only_fields = set(params["_fields"].split(","))
+            only_fields = set(self._parse_fields_param(params["_fields"]))
             if "_all" in only_fields:
                 include_all = True
         else:
@@ -282,6 +571,34 @@ class Resource(metaclass=ResourceMeta):
 
         return requested_fields
 
+    def get_nested_fields(self, params=None):
+        """
+        Return a map of the fields requested with a nested selection of their
+        own fields in the `_fields` param to that selection. For example,
+        `_fields=id,author(id,name)` returns {'author': 'id,name'}. The
+        selection is passed on to the field's related resource as its own
+        `_fields` param.
+        """
+        if params is None:
+            params = self.params
+        if not params or "_fields" not in params:
+            return {}
+        return {
+            self._reverse_rename_fields.get(field, field): selection
+            for field, selection in self._parse_fields_param(params["_fields"]).items()
+            if selection is not None
+        }
+
+    def _parse_fields_param(self, value):
+        try:
+            return parse_fields(value)
+        except ValueError:
+            raise ValidationError(
+                {
+                    "error": f'_fields has unbalanced parentheses (got "{value}" instead).'
+                }
+            )
+
     def get_max_limit(self):
         return self.max_limit
 
@@ -343,6 +660,149 @@ class Resource(metaclass=ResourceMeta):
             filters[field] = field_filters
         return filters
 
+    def get_filter_table(self):
+        """
+        Return a dispatch table mapping every query param key accepted by
+        this resource's filters to a prebuilt `(field, operator, negate)`
+        entry, along with a set of the first segments of all the filtered
+        field names.
+
+        For example, with `rename_fields = {'author': 'author_id'}` and
+        `filters = {'author_id': [operators.Exact, operators.In(allow_negation=True)]}`
+        the table contains:
+            {
+                'author_id': ('author', <Exact>, False),
+                'author_id__exact': ('author', <Exact>, False),
+                'author_id__in': ('author', <In>, False),
+                'author_id__not__in': ('author', <In>, True),
+            }
+
+        The table is compiled once per resource class, unless `get_filters`
+        or `get_rename_fields` are overridden, in which case their output
+        may vary between instances and the table is compiled per instance.
+        """
+        cls = self.__class__
+        if (
+            cls.get_filters is not Resource.get_filters
+            or cls.get_rename_fields is not Resource.get_rename_fields
+        ):
+            return self._compile_filter_table()
+        if "_compiled_filter_table" not in cls.__dict__:
+            cls._compiled_filter_table = self._compile_filter_table()
+        return cls._compiled_filter_table
+
+    def _compile_filter_table(self):
+        table = {}
+        prefixes = set()
+
+        # Process shorter field names first so that, just like when parsing a
+        # key, the longest matching field name wins.
+        for field in sorted(self._filters, key=lambda f: f.count("__")):
+            allowed_operators = self._filters[field]
+            if not allowed_operators:
+                continue
+            prefixes.add(field.split("__", 1)[0])
+            db_field = self._reverse_rename_fields.get(field, field)
+            for op_name, operator in allowed_operators.items():
+                operator = operator()
+                table["__".join(filter(None, [field, op_name]))] = (
+                    db_field,
+                    operator,
+                    False,
+                )
+                if operator.allow_negation:
+                    table["__".join(filter(None, [field, "not", op_name]))] = (
+                        db_field,
+                        operator,
+                        True,
+                    )
+        return table, prefixes
+
+    def get_raw_query_fields(self):
+        """
+        Return a map of this resource's document field names to
+        `(db_field, coerce)` tuples, used by operators to build raw MongoDB
+        queries (see `Operator.prepare_raw_query`). Fields missing from the
+        map (e.g. lookup paths or generic references) are filtered via
+        MongoEngine's queryset kwargs instead.
+
+        The map is computed once per resource class.
+        """
+        cls = self.__class__
+        if "_compiled_raw_query_fields" not in cls.__dict__:
+            raw_query_fields = {}
+            for name, field in self.document._fields.items():
+                if isinstance(field, (GenericReferenceField, CachedReferenceField)):
+                    continue
+                raw_query_fields[name] = (field.db_field, query_value_coercer(field))
+            id_field = self.document._meta.get("id_field")
+            if id_field in raw_query_fields:
+                raw_query_fields["pk"] = raw_query_fields[id_field]
+            cls._compiled_raw_query_fields = raw_query_fields
+        return cls._compiled_raw_query_fields
+
+    def get_field_comparators(self):
+        """
+        Return a map of this resource's document field names to functions
+        comparing a field's stored value with a new one (see
+        `field_comparator`), used by `update_object` to detect changed fields.
+        Fields missing from the map are compared with `equal`.
+
+        The map is computed once per resource class.
+        """
+        cls = self.__class__
+        if "_compiled_field_comparators" not in cls.__dict__:
+            comparators = {}
+            for name, field in self.document._fields.items():
+                compare = field_comparator(field)
+                if compare is not equal:
+                    comparators[name] = compare
+            cls._compiled_field_comparators = comparators
+        return cls._compiled_field_comparators
+
+    def _parse_filter_key(self, key):
+        """
+        Parse a query param key which isn't in the filter table, i.e. one
+        that targets a lookup path within a filtered field (for example
+        `?content__text=...` for a `content` filter). Return a
+        `(field, operator, negate)` tuple or None if the key isn't a valid
+        filter.
+        """
+        negate = False
+        op_name = ""
+        parts = key.split("__")
+        for i in range(len(parts) + 1, 0, -1):
+            field = "__".join(parts[:i])
+            allowed_operators = self._filters.get(field)
+            if allowed_operators:
+                parts = parts[i:]
+                break
+        if not allowed_operators:
+            return None
+
+        if parts:
+            # either an operator or a query lookup!  See what's allowed.
+            op_name = parts[-1]
+            if op_name in allowed_operators:
+                # operator; drop it
+                parts.pop()
+            else:
+                # assume it's part of a lookup
+                op_name = ""
+            if parts and parts[-1] == "not":
+                negate = True
+                parts.pop()
+
+        operator = allowed_operators.get(op_name, None)
+        if operator is None:
+            return None
+        if negate and not operator.allow_negation:
+            return None
+        if parts:
+            field = f"{field}__{'__'.join(parts)}"
+        field = self._reverse_rename_fields.get(field, field)
+        return field, operator(), negate
+
     def serialize_field(self, obj, **kwargs):
         if self.uri_prefix and hasattr(obj, "id"):
             return self._url(str(obj.id))
@@ -351,21 +811,103 @@ class Resource(metaclass=ResourceMeta):
 
     def _subresource(self, obj):
         """
-        Select and create an appropriate sub-resource class for delegation or
-        return None if there isn't one.
+        Select an appropriate sub-resource for delegation or return None if
+        there isn't one.
         """
-        s_class = self._child_document_resources.get(obj.__class__)
+        r = self._subresource_for_class(obj.__class__)
+        if r is not None:
+            r.view_method = self.view_method
+            r.data = self.data
+            r.parent_filter = self.parent_filter
+            # Don't carry the state of the previous object over
+            r._dirty_fields = None
+            if hasattr(r, "_raw_data"):
+                del r._raw_data
+        return r
+
+    def _subresource_for_class(self, document):
+        # Sub-resources are only created once per document class, and reused
+        # for all the objects of that class.
+        try:
+            return self._subresources[document]
+        except KeyError:
+            pass
+        s_class = self._child_document_resources.get(document)
         if not s_class and self._default_child_resource_document:
             s_class = self._child_document_resources[
                 self._default_child_resource_document
             ]
         if s_class and s_class != self.__class__:
             r = s_class(view_method=self.view_method)
-            r.data = self.data
-            return r
         else:
+            r = None
+        self._subresources[document] = r
+        return r
+
+    def get_serialization_plan(self, **kwargs):
+        """
+        Return the requested fields (see `get_requested_fields`) and the
+        nested field selections (see `get_nested_fields`) to serialize
+        objects with. They only depend on the `_fields` param, so they're
+        computed once and reused for all the objects of a request.
+        """
+        params = kwargs.get("params")
+        if "fields" in kwargs:
+            key = None
+        else:
+            key = (params.get("_fields") if params else None,)
+        plan = self._serialization_plans.get(key)
+        if plan is None:
+            plan = (
+                self.get_requested_fields(**kwargs),
+                self.get_nested_fields(params) if params else {},
+            )
+            if key is not None:
+                self._serialization_plans[key] = plan
+        return plan
+
+    def get_polymorphic_projection(self, qs, params):
+        """
+        For a resource with `child_document_resources`, return the union of
+        the fields requested from the resources of the document classes the
+        queryset can return, or None if some of them aren't document fields
+        (e.g. they're computed). Resources which customize how their fields
+        are serialized (overriding `serialize`, `get_field_value` or
+        `value_for_field`, or with a method named after a requested field)
+        may read any field, so nothing is left out for them either.
+        """
+        if not self._child_document_resources:
+            return None
+        class_names = qs._query.get("_cls")
+        if isinstance(class_names, str):
+            class_names = [class_names]
+        elif isinstance(class_names, dict) and "$in" in class_names:
+            class_names = class_names["$in"]
+        else:
+            class_names = qs._document._subclasses
+
+        resources = {
+            self._subresource_for_class(get_document(class_name)) or self
+            for class_name in class_names
+        }
+
+        if any(
+            getattr(type(resource), name) is not getattr(Resource, name)
+            for resource in resources | {self}
+            for name in ("serialize", "get_field_value", "value_for_field")
+        ):
             return None
 
+        fields = set()
+        for resource in resources:
+            requested_fields, _ = resource.get_serialization_plan(params=params)
+            if not set(requested_fields) <= set(resource.document._fields):
+                return None
+            if any(callable(getattr(resource, f, None)) for f in requested_fields):
+                return None
+            fields.update(requested_fields)
+        return fields
+
     def get_field_value(self, obj, field_name, field_instance=None, **kwargs):
         """Return a json-serializable field value.
 
@@ -441,19 +983,76 @@ class Resource(metaclass=ResourceMeta):
             else:
                 value = field_instance(obj)
         if field_name in self._related_resources:
+            related_resource = self._related_resources[field_name]
             if isinstance(value, list):
                 return [
-                    self._related_resources[field_name]().serialize_field(o, **kwargs)
-                    for o in value
+                    self.serialize_related(related_resource, o, **kwargs) for o in value
                 ]
             elif value is None:
                 return None
             else:
-                return self._related_resources[field_name]().serialize_field(
-                    value, **kwargs
-                )
+                return self.serialize_related(related_resource, value, **kwargs)
         return value
 
+    def serialize_related(self, related_resource, obj, **kwargs):
+        """
+        Serialize a related object using the given resource class.
+
+        When building a compound document (see `compound_documents`), the
+        `included` dict passed in `kwargs` maps document types to the
+        related objects serialized so far by id. Each related document is
+        then serialized into it only once, and a reference to it is returned
+        instead, e.g. {'type': 'User', 'id': '<id>'}. A document reached in
+        another shape than the included one (through another resource, or
+        with another nested field selection) is serialized in place.
+        """
+        included = kwargs.get("included")
+        if (
+            included is None
+            or related_resource.uri_prefix
+            or not isinstance(obj, mongoengine.Document)
+            or obj.pk is None
+        ):
+            return related_resource().serialize_field(obj, **kwargs)
+
+        doc_type = obj._class_name
+        obj_id = str(obj.pk)
+        shapes = getattr(included, "shapes", None)
+        if shapes is not None:
+            shape = (related_resource, (kwargs.get("params") or {}).get("_fields"))
+            if shapes.setdefault((doc_type, obj_id), shape) != shape:
+                return related_resource().serialize_field(obj, **kwargs)
+        included_objs = included.setdefault(doc_type, {})
+        if obj_id not in included_objs:
+            # Reserve the spot first in case the object references itself
+            included_objs[obj_id] = None
+            included_objs[obj_id] = related_resource().serialize_field(obj, **kwargs)
+        return {"type": doc_type, "id": obj_id}
+
+    def wants_minimal_response(self):
+        """
+        Return whether the client of the request that's currently being
+        processed asked for a minimal response to a write, i.e. only the id of
+        the object, via a `Prefer: return=minimal` header or a
+        `_return=minimal` param.
+        """
+        if not has_request_context():
+            return False
+        if self.params.get("_return") == "minimal":
+            return True
+        prefer = request.headers.get("Prefer", "")
+        return "return=minimal" in [p.strip() for p in prefer.split(",")]
+
+    def wants_compound_document(self, params):
+        """
+        Return whether the related objects of the objects returned by a
+        List request should be side-loaded into a compound document.
+        """
+        return self.compound_documents and params.get("_compound", "").lower() in (
+            "1",
+            "true",
+        )
+
     def serialize_dict_field(self, field_instance, field_name, field_value, **kwargs):
         """Serialize each value based on an explicit field type
         (e.g. if the schema defines a DictField(IntField), where all
@@ -492,8 +1091,8 @@ class Resource(metaclass=ResourceMeta):
             return (
                 field_value
                 and not isinstance(field_value, DBRef)
-                and self._related_resources[field_name]().serialize_field(
-                    field_value, **kwargs
+                and self.serialize_related(
+                    self._related_resources[field_name], field_value, **kwargs
                 )
             )
         else:
@@ -519,8 +1118,9 @@ class Resource(metaclass=ResourceMeta):
         if subresource:
             return subresource.serialize(obj, **kwargs)
 
-        # Get the requested fields
-        requested_fields = self.get_requested_fields(**kwargs)
+        # Get the requested fields, and the nested selections of the related
+        # resources' fields
+        requested_fields, nested_fields = self.get_serialization_plan(**kwargs)
 
         # Drop the kwargs we don't need any more (we're passing `kwargs` to
         # child resources so we don't want to pass `fields` and `params` that
@@ -536,6 +1136,14 @@ class Resource(metaclass=ResourceMeta):
             # resolve the user-facing name of the field
             renamed_field = self._rename_fields.get(field, field)
 
+            field_kwargs = kwargs
+            related_kwargs = {}
+            if "included" in kwargs:
+                related_kwargs["included"] = kwargs["included"]
+            if field in nested_fields:
+                related_kwargs["params"] = {"_fields": nested_fields[field]}
+                field_kwargs = dict(kwargs, params=related_kwargs["params"])
+
             # if the field is callable, execute it with `obj` as the param
             if hasattr(self, field) and callable(getattr(self, field)):
                 value = getattr(self, field)(obj)
@@ -543,20 +1151,31 @@ class Resource(metaclass=ResourceMeta):
                 # if the field is associated with a specific resource (via the
                 # `related_resources` map), use that resource to serialize it
                 if field in self._related_resources and value is not None:
-                    related_resource = self._related_resources[field]()
+                    related_resource = self._related_resources[field]
                     if isinstance(value, mongoengine.document.Document):
-                        value = related_resource.serialize_field(value)
+                        value = self.serialize_related(
+                            related_resource, value, **related_kwargs
+                        )
                     elif isinstance(value, dict):
                         value = {
-                            k: related_resource.serialize_field(v)
+                            k: self.serialize_related(
+                                related_resource, v, **related_kwargs
+                            )
                             for (k, v) in value.items()
                         }
                     else:  # assume queryset or list
-                        value = [related_resource.serialize_field(o) for o in value]
+                        value = [
+                            self.serialize_related(
+                                related_resource, o, **related_kwargs
+                            )
+                            for o in value
+                        ]
                 data[renamed_field] = value
             else:
                 try:
-                    data[renamed_field] = self.get_field_value(obj, field, **kwargs)
+                    data[renamed_field] = self.get_field_value(
+                        obj, field, **field_kwargs
+                    )
                 except UnknownFieldError:
                     with contextlib.suppress(UnknownFieldError):
                         data[renamed_field] = self.value_for_field(obj, field)
@@ -616,7 +1235,11 @@ class Resource(metaclass=ResourceMeta):
         # If CleanCat schema exists on this resource, use it to perform the
         # validation
         if self.schema:
-            if request.method == "PUT" and obj is not None:
+            # Items of a Sync request are validated against their existing
+            # object, like the body of a PUT request
+            if obj is not None and (
+                request.method == "PUT" or self.view_method == methods.Sync
+            ):
                 obj_data = {key: getattr(obj, key) for key in obj._fields.keys()}
             else:
                 obj_data = None
@@ -629,6 +1252,108 @@ class Resource(metaclass=ResourceMeta):
                     {"field-errors": schema.field_errors, "errors": schema.errors}
                 )
 
+    def get_time_budget(self):
+        """
+        Return the time budget (in milliseconds) of the request that's
+        currently being processed, or None if it isn't limited.
+        """
+        budget = self.max_time_ms
+        if self.deadline_header and has_request_context():
+            header = request.headers.get(self.deadline_header)
+            if header is not None:
+                if not isint(header) or int(header) <= 0:
+                    raise ValidationError(
+                        {
+                            "error": f'{self.deadline_header} must be a positive integer (got "{header}" instead).'
+                        }
+                    )
+                budget = min(budget or int(header), int(header))
+        return budget
+
+    def get_deadline(self):
+        """
+        Return the `time.monotonic()` time at which the time budget of the
+        request that's currently being processed runs out, or None.
+        """
+        if not hasattr(self, "_deadline"):
+            budget = self.get_time_budget()
+            self._deadline = budget and self._start_time + budget / 1000.0
+        return self._deadline
+
+    def apply_time_budget(self, qs):
+        """
+        Limit the execution time of the queryset to what's left of the
+        time budget of the request that's currently being processed.
+        """
+        deadline = self.get_deadline()
+        if not deadline:
+            return qs
+        remaining = int((deadline - time.monotonic()) * 1000)
+        if remaining <= 0:
+            raise QueryTimeout
+        return qs.max_time_ms(remaining)
+
+    def get_read_preference(self):
+        """
+        Return the read preference for the queries of the request that's
+        currently being processed, or None to use the connection's default.
+        """
+        # Objects about to be changed are always read from the primary.
+        if self.view_method not in (None, methods.List, methods.Fetch):
+            return ReadPreference.PRIMARY
+
+        if has_request_context():
+            consistency = self.params.get("_consistency")
+            if consistency == "strong":
+                return ReadPreference.PRIMARY
+            elif consistency == "eventual":
+                return self.eventual_read_preference
+            elif consistency is not None:
+                raise ValidationError(
+                    {
+                        "error": f'_consistency must be "strong" or "eventual" (got "{consistency}" instead).'
+                    }
+                )
+
+            if self.consistency_token_header:
+                token = request.headers.get(self.consistency_token_header)
+                if token is not None:
+                    try:
+                        write_time = float(token)
+                        # Tokens from the future would pin all the reads to
+                        # the primary
+                        if not time.time() - write_time >= -self.consistency_token_skew:
+                            raise ValueError(token)
+                    except ValueError:
+                        raise ValidationError(
+                            {
+                                "error": f'{self.consistency_token_header} is invalid (got "{token}").'
+                            }
+                        )
+                    if time.time() - write_time < self.read_your_writes_window:
+                        return ReadPreference.PRIMARY
+
+        return self.read_preferences.get(self.view_method, self.read_preference)
+
+    def apply_read_preference(self, qs):
+        """
+        Route the queryset's reads according to `get_read_preference`.
+        """
+        if not hasattr(self, "_read_preference"):
+            self._read_preference = self.get_read_preference()
+        if self._read_preference is None:
+            return qs
+        return qs.read_preference(self._read_preference)
+
+    def get_consistency_token(self):
+        """
+        Return the token to send to clients after a write (see
+        `consistency_token_header`), or None.
+        """
+        if not self.consistency_token_header:
+            return None
+        return f"{time.time():.3f}"
+
     def get_queryset(self):
         """
         Return a MongoEngine queryset that will later be used to return
@@ -636,23 +1361,37 @@ class Resource(metaclass=ResourceMeta):
         """
         return self.document.objects
 
+    def apply_parent_filter(self, qs):
+        """
+        Restrict the queryset to the children of the parent object of a
+        nested view (see `ResourceView.parent`). It's applied before any
+        other filter, so that the parent field leads the query.
+        """
+        if self.parent_filter:
+            qs = qs.filter(**self.parent_filter)
+        return qs
+
     def get_object(self, pk, qfilter=None):
         """
         Given a PK and an optional queryset filter function, find a matching
         document in the queryset.
         """
-        qs = self.get_queryset()
+        qs = self.apply_parent_filter(self.get_queryset())
         # If a queryset filter was provided, pass our current queryset in and
         # get a new one out
         if qfilter:
             qs = qfilter(qs)
+        qs = self.apply_read_preference(self.apply_time_budget(qs))
         obj = qs.get(pk=pk)
 
         # We don't need to fetch related resources for DELETE requests because
         # those requests do not serialize the object (a successful DELETE
         # simply returns a `{}`, at least by default). We still want to fetch
-        # related resources for GET and PUT.
-        if request.method != "DELETE":
+        # related resources for GET and PUT, unless the PUT only returns the
+        # object's id.
+        if request.method != "DELETE" and not (
+            request.method == "PUT" and self.wants_minimal_response()
+        ):
             self.fetch_related_resources(
                 [obj], self.get_requested_fields(params=self.params)
             )
@@ -663,91 +1402,402 @@ class Resource(metaclass=ResourceMeta):
         """
         Given a list of objects and an optional list of the only fields we
         should care about, fetch these objects' related resources.
+
+        For each field in `related_resources_hints`, the field's method on
+        each object returns a queryset of the related objects. These are
+        fetched with `$in` queries on the hint field (chunked by
+        `related_resources_chunk_size`) when all the querysets only differ by
+        the hinted object, or with a single `$or` query otherwise. The
+        results are then assigned to each object as a list.
         """
         if not self.related_resources_hints:
             return
 
-        # Create a map of field names to MongoEngine Q objects that will
-        # later be used to fetch the related resources from MongoDB
-        # Queries for the same document/collection are combined to improve
-        # efficiency.
-        document_queryset = {}
-        for obj in objs:
-            for field_name in self.related_resources_hints.keys():
-                if only_fields is not None and field_name not in only_fields:
-                    continue
+        tasks = []
+        task_fields = []
+        for field_name, hint_field in self.related_resources_hints.items():
+            if only_fields is not None and field_name not in only_fields:
+                continue
+
+            querysets = []
+            for obj in objs:
                 method = getattr(obj, field_name)
                 if callable(method):
-                    q = method()
-                    if field_name in document_queryset:
-                        document_queryset[field_name] = (
-                            document_queryset[field_name] | q._query_obj
-                        )
-                    else:
-                        document_queryset[field_name] = q._query_obj
-
-        # For each field name, execute the queries we generated in the block
-        # above, and map the results to each object that references them.
-        # TODO This is in dire need of refactoring, or a complete overhaul
-        hints = {}
-        for field_name, q_obj in document_queryset.items():
-            doc = self.get_related_resources()[field_name].document
-
-            # Create a QuerySet based on the query object
-            query = doc.objects.filter(q_obj)
-
-            # Don't let MongoDB do the sorting as it won't use the index.
-            # Store the ordering so we can do client sorting afterwards.
-            ordering = query._ordering or query._get_order_by(
-                query._document._meta["ordering"]
-            )
-            query = query.order_by()
+                    querysets.append(method())
+            if querysets:
+                field_tasks = self._get_prefetch_tasks(
+                    field_name, hint_field, querysets
+                )
+                tasks += field_tasks
+                task_fields += [field_name] * len(field_tasks)
 
-            # Fetch the results
-            results = list(query)
+        # The queries are independent from each other, so they can run
+        # concurrently.
+        prefetches = {}
+        for field_name, results in zip(task_fields, self.run_concurrently(tasks)):
+            prefetches.setdefault(field_name, []).extend(results)
 
-            # Reapply the ordering and add results to the mapping
-            if ordering:
-                document_queryset[field_name] = sorted(results, cmp_fields(ordering))
-            else:
-                document_queryset[field_name] = results
+        for field_name, results in prefetches.items():
+            hint_field = self.related_resources_hints[field_name]
 
-            # For each field name, create a map of obj PKs to a list of
-            # results they referenced.
+            # Map the PKs of the objects to a list of results referencing
+            # them, in a single pass preserving the results' order.
             hint_index = {}
-            if field_name in self.related_resources_hints:
-                hint_field = self.related_resources_hints[field_name]
-                for obj in document_queryset[field_name]:
-                    hint_field_instance = obj._fields[hint_field]
-                    # Don't trigger a query for SafeReferenceFields
-                    if SafeReferenceField and isinstance(
-                        hint_field_instance, SafeReferenceField
-                    ):
-                        hinted = obj._db_data[hint_field]
-                        if hint_field_instance.dbref:
-                            hinted = hinted.id
-                    else:
-                        hinted = str(getattr(obj, hint_field).id)
-                    if hinted not in hint_index:
-                        hint_index[hinted] = [obj]
-                    else:
-                        hint_index[hinted].append(obj)
-
-                hints[field_name] = hint_index
+            for result in results:
+                hint_index.setdefault(self._hinted_id(result, hint_field), []).append(
+                    result
+                )
 
-        # Assign the results to each object
-        # TODO This is in dire need of refactoring, or a complete overhaul
-        for obj in objs:
-            for field_name, hint_index in hints.items():
+            limit = self.related_resources_limits.get(field_name)
+            for obj in objs:
                 obj_id = obj.id
                 if isinstance(obj_id, DBRef):
                     obj_id = obj_id.id
-                elif isinstance(obj_id, ObjectId):
-                    obj_id = str(obj_id)
-                if obj_id not in hint_index:
-                    setattr(obj, field_name, [])
-                else:
-                    setattr(obj, field_name, hint_index[obj_id])
+                related = hint_index.get(obj_id, [])
+                if limit is not None:
+                    setattr(obj, f"{field_name}_has_more", len(related) > limit)
+                    related = related[:limit]
+                setattr(obj, field_name, related)
+
+    def run_concurrently(self, tasks):
+        """
+        Call the given functions and return a list of their results. If a
+        `related_resources_executor` is set, they're run concurrently in it,
+        waiting for them at most until the request's time budget runs out.
+
+        Cancelling the functions which are still running once the budget
+        runs out doesn't stop them, so their queries should be limited with
+        `apply_time_budget` when they start (like `_fetch_related` does). The
+        server then aborts them at the same deadline.
+        """
+        executor = self.related_resources_executor
+        if executor is None or len(tasks) < 2:
+            return [task() for task in tasks]
+
+        if has_request_context():
+            tasks = [copy_current_request_context(task) for task in tasks]
+        futures = [executor.submit(task) for task in tasks]
+
+        deadline = self.get_deadline()
+        try:
+            results = []
+            for future in futures:
+                timeout = None
+                if deadline:
+                    timeout = max(deadline - time.monotonic(), 0)
+                results.append(future.result(timeout=timeout))
+        except concurrent.futures.TimeoutError:
+            raise QueryTimeout
+        finally:
+            for future in futures:
+                future.cancel()
+        return results
+
+    def _get_prefetch_tasks(self, field_name, hint_field, querysets):
+        """
+        Return a list of functions fetching the related objects of the given
+        querysets, each returning a list of them. The related objects of each
+        object are fetched by a single function, in their order.
+        """
+        doc = self.get_related_resources()[field_name].document
+        order_by = _related_order_by(doc, querysets[0])
+
+        # Check whether all the querysets are the same query, except for the
+        # value of the hint field.
+        db_hint_field = doc._fields[hint_field].db_field
+        common_query = None
+        hinted_values = {}
+        for qs in querysets:
+            query = dict(qs._query)
+            hinted = query.pop(db_hint_field, None)
+            if (
+                hinted is None
+                or isinstance(hinted, dict)
+                or (common_query is not None and query != common_query)
+            ):
+                common_query = None
+                break
+            common_query = query
+            hinted_values[hinted] = None
+
+        # Only load the fields which get serialized
+        fields = self.get_related_projection(
+            field_name, [hint_field] + [key.lstrip("-") for key in order_by]
+        )
+
+        limit = self.related_resources_limits.get(field_name)
+        if limit is not None and common_query is not None:
+            # Only fetch the first `limit` + 1 related objects of each
+            # object, so that we know whether there are more.
+            return [
+                functools.partial(
+                    self._fetch_related,
+                    doc.objects(
+                        __raw__=dict(common_query, **{db_hint_field: hinted})
+                    ),
+                    fields,
+                    order_by,
+                    limit + 1,
+                )
+                for hinted in hinted_values
+            ]
+
+        if common_query is None:
+            # Fall back to combining the queries
+            q_obj = querysets[0]._query_obj
+            for qs in querysets[1:]:
+                q_obj = q_obj | qs._query_obj
+            queries = [doc.objects.filter(q_obj)]
+        else:
+            hinted_values = list(hinted_values)
+            chunk_size = self.related_resources_chunk_size
+            queries = [
+                doc.objects(
+                    __raw__=dict(
+                        common_query,
+                        **{db_hint_field: {"$in": hinted_values[i : i + chunk_size]}},
+                    )
+                )
+                for i in range(0, len(hinted_values), chunk_size)
+            ]
+        return [
+            functools.partial(self._fetch_related, query, fields, order_by)
+            for query in queries
+        ]
+
+    def _fetch_related(self, qs, fields, order_by, limit=None):
+        """
+        Return the results of a queryset of related objects, sorted by a list
+        of `order_by` style keys, only loading the given fields (if any) and
+        fetching at most `limit` of them.
+        """
+        qs = self.apply_read_preference(self.apply_time_budget(qs))
+        if fields:
+            qs = qs.only(*fields)
+
+        # Only let MongoDB do the sorting if an index supports it, or if only
+        # the first objects are fetched.
+        if limit is not None:
+            return list(qs.order_by(*(order_by or ["pk"])).limit(limit))
+        if self.related_resources_server_ordering:
+            return list(qs.order_by(*order_by))
+        results = list(qs.order_by())
+        _sort_documents(results, order_by)
+        return results
+
+    def _hinted_id(self, obj, hint_field):
+        """
+        Return the id of the object referenced by the hint field of a
+        related object, without dereferencing it.
+        """
+        hint_field_instance = obj._fields[hint_field]
+        # Don't trigger a query for SafeReferenceFields
+        if SafeReferenceField and isinstance(hint_field_instance, SafeReferenceField):
+            hinted = obj._db_data[hint_field]
+        else:
+            hinted = obj._data.get(hint_field)
+        if isinstance(hinted, DBRef):
+            return hinted.id
+        elif isinstance(hinted, mongoengine.Document):
+            return hinted.pk
+        return hinted
+
+    def get_related_lookups(self, qs, only_fields=None):
+        """
+        Return a map of the related fields which can be joined to the
+        queryset in `related_resources_lookup` mode to their `$lookup`
+        stage specs, or None if the queryset can't be run as an aggregation.
+        """
+        if qs._search_text or qs._loaded_fields or qs._none or qs._empty:
+            return None
+
+        # `$lookup` stages can't have both join fields and a sub-pipeline
+        # before MongoDB 5.0
+        pipelines = server_version(qs._collection) >= (5, 0)
+        lookups = {}
+        for field_name, related_resource in self._related_resources.items():
+            if only_fields is not None and field_name not in only_fields:
+                continue
+            doc = related_resource.document
+            if field_name in self.related_resources_hints:
+                hint_field = self.related_resources_hints[field_name]
+                lookup = self._get_reverse_lookup(
+                    field_name, doc, hint_field, pipelines
+                )
+            else:
+                field = self.document._fields.get(field_name)
+                if (
+                    not isinstance(field, ReferenceField)
+                    or field.dbref
+                    or field.document_type is not doc
+                ):
+                    continue
+                lookup = {
+                    "from": doc._get_collection_name(),
+                    "localField": field.db_field,
+                    "foreignField": "_id",
+                    "pipeline": [],
+                    "order_by": [],
+                    "many": False,
+                    "limit": None,
+                }
+            if lookup is not None:
+                fields = pipelines and self.get_related_projection(
+                    field_name, [key.lstrip("-") for key in lookup["order_by"]]
+                )
+                if fields:
+                    lookup["pipeline"].append({"$project": _db_projection(doc, fields)})
+                lookups[field_name] = lookup
+        return lookups
+
+    def _get_reverse_lookup(self, field_name, doc, hint_field, pipelines=True):
+        # Find out which query the field's method runs by calling it on two
+        # placeholder objects with different ids and field values, and only
+        # join it if it's a query on the hint field whose other conditions
+        # don't depend on the object (as they'd be applied to all objects).
+        db_hint_field = doc._fields[hint_field].db_field
+        id_field = self.document._meta["id_field"]
+        queries = []
+        for fill in (False, True):
+            placeholder = self.document(pk=ObjectId())
+            if fill:
+                for name in self.document._fields:
+                    if name != id_field:
+                        placeholder._data[name] = _PlaceholderValue()
+            try:
+                qs = getattr(placeholder, field_name)()
+                if not isinstance(qs, mongoengine.QuerySet):
+                    return None
+                query = dict(qs._query)
+            except Exception:
+                return None
+            if query.pop(db_hint_field, None) != placeholder.pk:
+                return None
+            queries.append((query, qs._ordering))
+        if queries[0] != queries[1]:
+            return None
+        # Other conditions can only be applied by a sub-pipeline
+        if query and not pipelines:
+            return None
+
+        order_by = _related_order_by(doc, qs)
+        limit = self.related_resources_limits.get(field_name)
+        pipeline = []
+        if pipelines:
+            if query:
+                pipeline.append({"$match": query})
+            if limit is not None:
+                pipeline.append({"$sort": _related_sort(doc, qs)})
+                pipeline.append({"$limit": limit + 1})
+            elif order_by and self.related_resources_server_ordering:
+                pipeline.append({"$sort": _related_sort(doc, qs)})
+        return {
+            "from": doc._get_collection_name(),
+            "localField": "_id",
+            "foreignField": db_hint_field,
+            "pipeline": pipeline,
+            "order_by": order_by,
+            "many": True,
+            "limit": limit,
+        }
+
+    def get_related_projection(self, field_name, extra_fields=()):
+        """
+        Return the set of fields to load of a related field's objects, i.e.
+        the ones their resource serializes (given the field's nested
+        selection in the `_fields` param, if any) and `extra_fields`, or None
+        if all of them should be loaded.
+        """
+        related_resource = self._related_resources[field_name]()
+        # Documents of a subclass may be serialized with other fields
+        if related_resource._child_document_resources:
+            return None
+        params = {}
+        if has_request_context():
+            nested_fields = self.get_nested_fields()
+            if field_name in nested_fields:
+                params = {"_fields": nested_fields[field_name]}
+        fields = set(related_resource.get_requested_fields(params=params))
+        fields |= set(extra_fields)
+        doc_fields = set(related_resource.document._fields)
+        if not fields <= doc_fields or fields == doc_fields:
+            return None
+        return fields
+
+    def aggregate_objects(self, qs, lookups):
+        """
+        Run a queryset and the given related field lookups (see
+        `get_related_lookups`) as a single aggregation, and yield the
+        resulting objects with their related objects set.
+        """
+        pipeline = []
+        if qs._query:
+            pipeline.append({"$match": qs._query})
+        # Like MongoEngine, fall back to the document's default ordering
+        ordering = qs._ordering
+        if ordering is None:
+            ordering = qs._get_order_by(qs._document._meta.get("ordering") or [])
+        if ordering:
+            pipeline.append({"$sort": dict(ordering)})
+        if qs._skip:
+            pipeline.append({"$skip": qs._skip})
+        if qs._limit is not None:
+            pipeline.append({"$limit": qs._limit})
+        for field_name, lookup in lookups.items():
+            stage = {
+                "from": lookup["from"],
+                "localField": lookup["localField"],
+                "foreignField": lookup["foreignField"],
+                "as": field_name,
+            }
+            if lookup["pipeline"]:
+                stage["pipeline"] = lookup["pipeline"]
+            pipeline.append({"$lookup": stage})
+
+        for son in self.aggregate(qs, pipeline):
+            joined = {field_name: son.pop(field_name) for field_name in lookups}
+            obj = self.document._from_son(son)
+            for field_name, lookup in lookups.items():
+                doc = self._related_resources[field_name].document
+                related = [
+                    doc._from_son(related_son) for related_son in joined[field_name]
+                ]
+                if lookup["many"]:
+                    # Joins without a sub-pipeline aren't sorted
+                    sorted_by_server = (
+                        self.related_resources_server_ordering and lookup["pipeline"]
+                    )
+                    if not sorted_by_server:
+                        _sort_documents(related, lookup["order_by"])
+                    if lookup["limit"] is not None:
+                        setattr(
+                            obj,
+                            f"{field_name}_has_more",
+                            len(related) > lookup["limit"],
+                        )
+                        related = related[: lookup["limit"]]
+                    setattr(obj, field_name, related)
+                elif related:
+                    # Bypass change tracking, this is what was loaded.
+                    obj._data[field_name] = related[0]
+            yield obj
+
+    def aggregate(self, qs, pipeline):
+        """
+        Run an aggregation pipeline on the collection of a queryset, with
+        the queryset's time limit, collation, index hint and read preference.
+        """
+        kwargs = {}
+        if qs._max_time_ms:
+            kwargs["maxTimeMS"] = qs._max_time_ms
+        if qs._collation:
+            kwargs["collation"] = qs._collation
+        if qs._hint not in (-1, None):
+            kwargs["hint"] = qs._hint
+        collection = qs._collection
+        if qs._read_preference is not None:
+            collection = collection.with_options(read_preference=qs._read_preference)
+        return collection.aggregate(pipeline, **kwargs)
 
     def apply_filters(self, qs, params=None):
         """
@@ -758,7 +1808,31 @@ class Resource(metaclass=ResourceMeta):
         if params is None:
             params = self.params
 
+        base_qs = qs
+        raw_query = {}
+        self._query_filters = []
+        self._query_collated = False
+        # Filters on string fields whose results would be changed by the
+        # collation of a collated filter
+        string_filters = set()
         for key, value in params.items():
+            entry = self._filter_table.get(key)
+            if entry is None:
+                # Keys which don't start with a filtered field name can be
+                # rejected right away. Anything else may be a lookup path.
+                if key.split("__", 1)[0] not in self._filter_prefixes:
+                    continue
+                entry = self._parse_filter_key(key)
+                if entry is None:
+                    continue
+            field, operator, negate = entry
+            qs = operator.prepare_queryset(qs)
+            self._query_filters.append((field, operator.op, negate))
+            if isinstance(operator, CollationOperator):
+                self._query_collated = True
+            elif operator.collation_sensitive and self._is_string_field(field):
+                string_filters.add(field)
+
             # If this is a resource identified by a URI, we need
             # to extract the object id at this point since
             # MongoEngine only understands the object id
@@ -774,42 +1848,52 @@ class Resource(metaclass=ResourceMeta):
             elif value in ['""', "''"]:
                 value = ""
 
-            negate = False
-            op_name = ""
-            parts = key.split("__")
-            for i in range(len(parts) + 1, 0, -1):
-                field = "__".join(parts[:i])
-                allowed_operators = self._filters.get(field)
-                if allowed_operators:
-                    parts = parts[i:]
-                    break
-            if allowed_operators is None:
-                continue
+            # Prefer building a raw query fragment, so that MongoEngine
+            # doesn't have to parse the kwargs and resolve the field again.
+            raw_query_field = self._raw_query_fields.get(field)
+            if raw_query_field and operator.raw_query:
+                db_field, coerce = raw_query_field
+                try:
+                    fragment = operator.prepare_raw_query(
+                        db_field, value, negate, coerce
+                    )
+                except ValueError:
+                    # Let MongoEngine handle values it can't convert.
+                    fragment = None
+                if fragment is not None:
+                    merge_raw_query(raw_query, fragment)
+                    continue
 
-            if parts:
-                # either an operator or a query lookup!  See what's allowed.
-                op_name = parts[-1]
-                if op_name in allowed_operators:
-                    # operator; drop it
-                    parts.pop()
-                else:
-                    # assume it's part of a lookup
-                    op_name = ""
-                if parts and parts[-1] == "not":
-                    negate = True
-                    parts.pop()
-
-            operator = allowed_operators.get(op_name, None)
-            if operator is None:
-                continue
-            if negate and not operator.allow_negation:
-                continue
-            if parts:
-                field = f"{field}__{'__'.join(parts)}"
-            field = self._reverse_rename_fields.get(field, field)
-            qs = operator().apply(qs, field, value, negate)
+            qs = operator.apply(qs, field, value, negate)
+
+        if raw_query:
+            qs = qs.filter(__raw__=raw_query)
+
+        # A collation applies to the whole query, including the conditions
+        # of the queryset the filters were applied to, see CollationOperator
+        if self._query_collated and (
+            string_filters or _has_string_condition(base_qs._query)
+        ):
+            raise ValidationError(
+                {
+                    "error": "Case-insensitive filters can't be combined with other filters on text fields."
+                }
+            )
         return qs
 
+    def _is_string_field(self, field):
+        """
+        Whether a document field (or `__` separated lookup path) holds
+        strings or lists of strings.
+        """
+        try:
+            field = self.document._lookup_field(field.split("__"))[-1]
+        except Exception:
+            return False
+        if isinstance(field, ListField):
+            field = field.field
+        return isinstance(field, StringField)
+
     def apply_ordering(self, qs, params=None):
         """
         Given this resource's allowed_ordering, and the params of the request
@@ -818,14 +1902,45 @@ class Resource(metaclass=ResourceMeta):
         """
         if params is None:
             params = self.params
+        self._query_ordering = None
         if self.allowed_ordering and params.get("_order_by") in self.allowed_ordering:
+            self._query_ordering = params["_order_by"]
             order_params = [
                 self._reverse_rename_fields.get(p, p)
                 for p in params["_order_by"].split(",")
             ]
             qs = qs.order_by(*order_params)
+
+        # A collation applies to the sort too (including the queryset's own
+        # or default ordering), see CollationOperator
+        if self._query_collated:
+            ordering = qs._ordering
+            if ordering is None:
+                ordering = qs._get_order_by(qs._document._meta.get("ordering") or [])
+            if any(
+                self._is_string_field(
+                    qs._document._reverse_db_field_map.get(key, key).replace(".", "__")
+                )
+                for key, _ in ordering
+            ):
+                raise ValidationError(
+                    {
+                        "error": "Case-insensitive filters can't be combined with an ordering by a text field."
+                    }
+                )
         return qs
 
+    def get_index_hint(self):
+        """
+        Return the index MongoDB should use for the query built by the last
+        `apply_filters` and `apply_ordering` calls, if one is declared in
+        `index_hints`.
+        """
+        if not self.index_hints:
+            return None
+        fields = tuple(sorted({field for field, _, _ in self._query_filters}))
+        return self.index_hints.get((fields, self._query_ordering))
+
     def get_skip_and_limit(self, params=None):
         """
         Perform validation and return sanitized values for _skip and _limit
@@ -889,6 +2004,7 @@ class Resource(metaclass=ResourceMeta):
         if qs is None:
             custom_qs = False
             qs = self.get_queryset()
+        qs = self.apply_parent_filter(qs)
 
         # If a queryset filter was provided, pass our current queryset in and
         # get a new one out
@@ -899,23 +2015,85 @@ class Resource(metaclass=ResourceMeta):
         # request
         qs = self.apply_filters(qs, params)
         qs = self.apply_ordering(qs, params)
+        if self.parent_filter:
+            self._query_filters[:0] = [
+                (field, "exact", False) for field in self.parent_filter
+            ]
+
+        # Only load the fields which get serialized from documents of
+        # different classes
+        if self.view_method == methods.List:
+            fields = self.get_polymorphic_projection(qs, params)
+            if fields:
+                qs = qs.only(*fields)
+
+        # Use a declared index for known query shapes, unless a filter
+        # already picked one.
+        hint = self.get_index_hint()
+        if hint is not None and qs._hint in (-1, None):
+            qs = qs.hint(hint)
 
         # Apply limit and skip to the queryset
         limit = None
+        ids = None
         if self.view_method == methods.BulkUpdate:
             # limit the number of objects that can be bulk-updated at a time
             qs = qs.limit(self.bulk_update_limit)
+        elif self.view_method == methods.List and "_ids" in params:
+            # Multi-get of the objects with the given ids
+            ids, invalid_ids = self.get_requested_ids(params)
+            qs = qs.filter(pk__in=list(ids))
         elif not custom_qs:
             # no need to skip/limit if a custom `qs` was provided
             skip, limit = self.get_skip_and_limit(params)
             qs = qs.skip(skip).limit(limit + 1)
 
-        # Needs to be at the end as it returns a list, not a queryset
-        if self.select_related:
-            qs = qs.select_related()
+        requested_fields = self.get_requested_fields(params=params)
+        lookups = None
+        if self.related_resources_lookup and not self.select_related:
+            lookups = self.get_related_lookups(qs, requested_fields)
 
-        # Evaluate the queryset
-        objs = list(qs)
+        # The sampled explain runs under the request's time budget and read
+        # preference too, and the query gets what's left of the budget
+        examined = check_query_plan(
+            self, self.apply_read_preference(self.apply_time_budget(qs))
+        )
+        qs = self.apply_read_preference(self.apply_time_budget(qs))
+        start_time = time.monotonic()
+
+        # Evaluate the queryset, keeping what was fetched before running out
+        # of time if partial results are allowed
+        objs = []
+        partial = False
+        try:
+            if lookups is not None:
+                qs = self.aggregate_objects(qs, lookups)
+
+            # Needs to be at the end as it returns a list, not a queryset
+            elif self.select_related:
+                qs = qs.select_related()
+
+            for obj in qs:
+                objs.append(obj)
+        except ExecutionTimeout:
+            if not (
+                self.partial_results and self.view_method == methods.List and limit
+            ):
+                raise
+            partial = True
+
+        if self.query_stats is not None:
+            self.query_stats.record(
+                query_shape(
+                    self.__class__.__name__,
+                    self._query_filters,
+                    self._query_ordering,
+                    limit,
+                ),
+                (time.monotonic() - start_time) * 1000,
+                len(objs),
+                examined,
+            )
 
         # Raise a validation error if bulk update would result in more than
         # bulk_update_limit updates
@@ -932,7 +2110,9 @@ class Resource(metaclass=ResourceMeta):
             )
 
         # Determine the value of has_more
-        if self.view_method != methods.BulkUpdate and self.paginate:
+        if ids is not None:
+            has_more = None
+        elif self.view_method != methods.BulkUpdate and self.paginate:
             has_more = len(objs) > limit
             if has_more:
                 objs = objs[:-1]
@@ -940,10 +2120,69 @@ class Resource(metaclass=ResourceMeta):
             has_more = None
 
         # bulk-fetch related resources for moar speed
-        self.fetch_related_resources(objs, self.get_requested_fields(params=params))
+        if lookups:
+            requested_fields = [f for f in requested_fields if f not in lookups]
+        if partial:
+            self._deadline = time.monotonic() + self.partial_results_grace_ms / 1000.0
+            try:
+                self.fetch_related_resources(objs, requested_fields)
+            except (QueryTimeout, ExecutionTimeout):
+                objs = []
+        else:
+            self.fetch_related_resources(objs, requested_fields)
+
+        if ids is not None:
+            # Return the objects in the requested order, and report the ones
+            # which weren't found.
+            objs_by_id = {obj.pk: obj for obj in objs}
+            objs = [objs_by_id[pk] for pk in ids if pk in objs_by_id]
+            missing = {
+                requested_id for pk, requested_id in ids.items() if pk not in objs_by_id
+            }
+            missing.update(invalid_ids)
+            missing = [
+                requested_id
+                for requested_id in dict.fromkeys(params["_ids"].split(","))
+                if requested_id in missing
+            ]
+            return objs, has_more, {"missing": missing}
 
+        if partial:
+            return (
+                objs,
+                True,
+                {"partial": True, "continuation": {"_skip": str(skip + len(objs))}},
+            )
         return objs, has_more
 
+    def get_requested_ids(self, params):
+        """
+        Parse the comma-separated list of ids of a multi-get request (the
+        `_ids` param) and return a dict mapping the ids (as stored in MongoDB)
+        to their requested form, in the requested order, and a list of the
+        requested ids which aren't valid ids.
+        """
+        requested_ids = [i for i in params["_ids"].split(",") if i]
+        max_limit = self.get_max_limit()
+        if len(requested_ids) > max_limit:
+            raise ValidationError(
+                {
+                    "error": f"The number of ids you requested is larger than the maximum limit for this resource (max_limit = {max_limit})."
+                }
+            )
+
+        _, coerce = self._raw_query_fields.get("pk", (None, None))
+        ids = {}
+        invalid_ids = []
+        for requested_id in requested_ids:
+            try:
+                pk = coerce(None, requested_id) if coerce else requested_id
+            except (ValueError, TypeError, mongoengine.ValidationError):
+                invalid_ids.append(requested_id)
+            else:
+                ids.setdefault(pk, requested_id)
+        return ids, invalid_ids
+
     def save_related_objects(self, obj, parent_resources=None):
         if not parent_resources:
             parent_resources = [self]
@@ -951,6 +2190,8 @@ class Resource(metaclass=ResourceMeta):
             parent_resources += [self]
 
         if self._dirty_fields:
+            # Documents which can be saved in bulk, rather than one by one
+            bulk_instances = []
             for field_name in set(self._dirty_fields) & set(
                 self.get_save_related_fields()
             ):
@@ -963,32 +2204,83 @@ class Resource(metaclass=ResourceMeta):
 
                 # If it's a ReferenceField, just save it.
                 if isinstance(field_instance, ReferenceField):
-                    instance = getattr(obj, field_name)
-                    if instance:
-                        if related_resource:
-                            related_resource().save_object(
-                                instance, parent_resources=parent_resources
-                            )
-                        else:
-                            instance.save()
+                    instances = [getattr(obj, field_name)]
 
                 # If it's a ListField(ReferenceField), save all instances.
-                if isinstance(field_instance, ListField) and isinstance(
+                elif isinstance(field_instance, ListField) and isinstance(
                     field_instance.field, ReferenceField
                 ):
-                    instance_list = getattr(obj, field_name)
-                    for instance in instance_list:
-                        if related_resource:
-                            related_resource().save_object(
-                                instance, parent_resources=parent_resources
-                            )
-                        else:
-                            instance.save()
+                    instances = getattr(obj, field_name)
+                else:
+                    continue
+
+                for instance in instances:
+                    if not instance:
+                        continue
+                    if self.bulk_save_related and (
+                        not related_resource or related_resource.saves_in_bulk()
+                    ):
+                        bulk_instances.append(instance)
+                    elif related_resource:
+                        related_resource().save_object(
+                            instance, parent_resources=parent_resources
+                        )
+                    else:
+                        instance.save()
+
+            self.bulk_save_objects(bulk_instances)
+
+    @classmethod
+    def saves_in_bulk(cls):
+        """
+        Whether objects saved as related objects of another resource can be
+        written in bulk (see `bulk_save_objects`), i.e. whether this resource
+        doesn't customize how its objects are saved.
+        """
+        return (
+            cls.save_object is Resource.save_object
+            and cls.save_related_objects is Resource.save_related_objects
+        )
+
+    def bulk_save_objects(self, objs):
+        """
+        Save new and changed documents with a single `bulk_write` per
+        collection, skipping the unchanged ones. The documents are validated
+        like `Document.save` does, but MongoEngine's save signals aren't sent
+        and the documents aren't reloaded (their in-memory state is kept).
+        """
+        operations = {}
+        seen = set()
+        for obj in objs:
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if obj._created or obj._get_changed_fields():
+                obj.validate()
+            operation = self.get_write_operation(obj)
+            if operation is not None:
+                _, collection_operations = operations.setdefault(
+                    obj._get_collection_name(), (type(obj), [])
+                )
+                collection_operations.append((obj, operation))
+
+        for document, collection_operations in operations.values():
+            errors = self.bulk_write(
+                [operation for _, operation in collection_operations], document=document
+            )
+            if errors:
+                raise mongoengine.OperationError(
+                    f"Could not save document ({errors[min(errors)]})"
+                )
+            for obj, _ in collection_operations:
+                obj._created = False
+                obj._clear_changed_fields()
 
     def save_object(self, obj, **kwargs):
         self.save_related_objects(obj, **kwargs)
         obj.save()
-        obj.reload()
+        if self.reload_after_save and not self.wants_minimal_response():
+            obj.reload()
 
         self._dirty_fields = None  # No longer dirty.
 
@@ -1007,6 +2299,19 @@ class Resource(metaclass=ResourceMeta):
         update_dict = {
             field: value for field, value in data.items() if field in filter_fields
         }
+
+        # The objects of a nested view belong to the parent object of the
+        # request (see `ResourceView.parent`)
+        for field, parent in (self.parent_filter or {}).items():
+            value = update_dict.get(field)
+            if (update and field in update_dict) or value is not None:
+                if value is None or reference_id(value) != parent.pk:
+                    key = self._rename_fields.get(field, field)
+                    raise ValidationError(
+                        {"field-errors": {key: "Must be the parent object."}}
+                    )
+            elif not update:
+                update_dict[field] = parent
         return update_dict
 
     def create_object(self, data=None, save=True, parent_resources=None):
@@ -1017,6 +2322,134 @@ class Resource(metaclass=ResourceMeta):
             self.save_object(obj)
         return obj
 
+    def insert_objects(self, objs):
+        """
+        Insert new (validated) objects with a single unordered `insert_many`,
+        bypassing `save_object`. All the objects are attempted, even if some
+        of them fail (e.g. because of a duplicate key). Return a dict mapping
+        the indexes of the objects which couldn't be inserted to an error
+        message.
+        """
+        if not objs:
+            return {}
+        docs = [obj.to_mongo() for obj in objs]
+        errors = {}
+        try:
+            self.document._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            errors = {
+                error["index"]: error["errmsg"] for error in e.details["writeErrors"]
+            }
+        for index, (obj, doc) in enumerate(zip(objs, docs)):
+            if index not in errors:
+                obj.pk = doc["_id"]
+                obj._created = False
+        return errors
+
+    def bulk_write(self, operations, ordered=True, document=None):
+        """
+        Run a list of pymongo write operations on the collection of this
+        resource's (or the given) document with a single `bulk_write`, and
+        return a dict mapping the indexes of the operations which failed to an
+        error message.
+        """
+        if not operations:
+            return {}
+        collection = (document or self.document)._get_collection()
+        try:
+            collection.bulk_write(operations, ordered=ordered)
+        except BulkWriteError as e:
+            return {
+                error["index"]: error["errmsg"] for error in e.details["writeErrors"]
+            }
+        return {}
+
+    def get_sync_objects(self, items, qfilter=None):
+        """
+        Look up the existing objects matching the `sync_key` of the items of
+        a Sync request with a single `$in` query. Return a dict mapping the
+        indexes of the items to their object (or None if there's none yet),
+        and a dict mapping the indexes of the items without a valid (or with
+        a duplicate) key, or whose object can't be synced, to an error. An
+        optional queryset filter function restricts the objects which can be
+        synced.
+        """
+        key_name = self._rename_fields.get(self.sync_key, self.sync_key)
+        key_field = self.document._fields[self.sync_key]
+        db_field, coerce = self._raw_query_fields[self.sync_key]
+        keys = {}
+        errors = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[index] = {"error": "JSON data must be a dict."}
+                continue
+            value = item.get(key_name)
+            if value is None:
+                errors[index] = {"field-errors": {key_name: "This field is required."}}
+                continue
+            try:
+                if isinstance(value, (dict, list)):
+                    raise ValueError(value)
+                key = coerce(None, value)
+            except (ValueError, mongoengine.ValidationError):
+                errors[index] = {"field-errors": {key_name: "Invalid value."}}
+                continue
+            if key in keys:
+                errors[index] = {"field-errors": {key_name: "Duplicate value."}}
+                continue
+            keys[key] = index
+
+        existing = {}
+        if keys:
+            # The keys are looked up across parents and regardless of the
+            # filter function, so that objects which can't be synced aren't
+            # taken for new ones
+            qs = self.get_queryset().filter(__raw__={db_field: {"$in": list(keys)}})
+            allowed = None
+            if qfilter:
+                allowed = set(qfilter(qs).scalar(self.document._meta["id_field"]))
+            for obj in qs:
+                key = key_field.to_mongo(getattr(obj, self.sync_key))
+                if key not in keys:
+                    continue
+                if any(
+                    reference_id(obj._data.get(field)) != parent.pk
+                    for field, parent in (self.parent_filter or {}).items()
+                ):
+                    errors[keys.pop(key)] = {
+                        "field-errors": {key_name: "Belongs to another parent."}
+                    }
+                elif allowed is not None and obj.pk not in allowed:
+                    errors[keys.pop(key)] = {"error": "Unauthorized"}
+                else:
+                    existing[key] = obj
+        objs = {index: existing.get(key) for key, index in keys.items()}
+        return objs, errors
+
+    def get_write_operation(self, obj):
+        """
+        Return the pymongo write operation saving a validated object: an
+        insert for a new object (or an upsert if it already has a primary
+        key, like `Document.save` does), an update setting (and unsetting)
+        only the changed fields of an existing object, or None if the
+        existing object is unchanged.
+        """
+        if obj._created:
+            doc = obj.to_mongo()
+            if "_id" in doc:
+                return ReplaceOne({"_id": doc["_id"]}, doc, upsert=True)
+            doc["_id"] = obj.pk = ObjectId()
+            return InsertOne(doc)
+        sets, unsets = obj._delta()
+        if not sets and not unsets:
+            return None
+        update = {}
+        if sets:
+            update["$set"] = sets
+        if unsets:
+            update["$unset"] = unsets
+        return UpdateOne({"_id": obj.pk}, update)
+
     def update_object(self, obj, data=None, save=True, parent_resources=None):
         subresource = self._subresource(obj)
         if subresource:
@@ -1028,6 +2461,10 @@ class Resource(metaclass=ResourceMeta):
 
         self._dirty_fields = []
 
+        # Related objects which get saved along with the object are compared
+        # by value rather than by id.
+        save_related_fields = set(self.get_save_related_fields())
+
         for field, value in update_dict.items():
             update = False
 
@@ -1041,6 +2478,9 @@ class Resource(metaclass=ResourceMeta):
                 id_from_data = value and getattr(value, "pk", value)
                 if id_from_obj != id_from_data:
                     update = True
+            elif field in self._field_comparators and field not in save_related_fields:
+                if not self._field_comparators[field](obj._data.get(field), value):
+                    update = True
             elif not equal(getattr(obj, field), value):
                 update = True
 
@@ -1048,9 +2488,237 @@ class Resource(metaclass=ResourceMeta):
                 setattr(obj, field, value)
                 self._dirty_fields.append(field)
 
-        if save:
+        # Nothing to save if nothing changed
+        if save and self._dirty_fields:
             self.save_object(obj)
         return obj
 
+    def get_patch_update(self):
+        """
+        Validate the body of a PATCH request and return the corresponding
+        MongoEngine update kwargs. Plain keys are set, and the supported
+        operators (see `PATCH_OPERATORS`) map field names to values, e.g.:
+
+            {"title": "New title", "$inc": {"views": 1}, "$push": {"tags": "a"}}
+
+        Each value is validated against the schema's field (or the list
+        field's item field for `$push`, `$pull` and `$addToSet`, which also
+        accept a list of items), or against the document's field if there's
+        no schema. Note that schema level validation (`Schema.clean`) can't
+        run as the rest of the object isn't loaded.
+        """
+        operations = []
+        for key, value in self.raw_data.items():
+            if key == "_params":
+                continue
+            if not key.startswith("$"):
+                operations.append(("$set", key, value))
+            elif key in PATCH_OPERATORS and isinstance(value, dict):
+                operations.extend((key, name, v) for name, v in value.items())
+            else:
+                raise ValidationError(
+                    {"error": f'"{key}" is not a supported update operator.'}
+                )
+
+        update = {}
+        field_errors = {}
+        for operator, name, value in operations:
+            field = self._reverse_rename_fields.get(name, name)
+            if name in field_errors:
+                continue
+            if any(key.split("__", 1)[1] == field for key in update):
+                field_errors[name] = "Conflicting updates."
+                continue
+            try:
+                key, value = self.prepare_patch_operation(operator, field, value)
+            except SchemaValidationError as e:
+                field_errors[name] = e.args and e.args[0]
+            except mongoengine.ValidationError as e:
+                field_errors[name] = e.message
+            else:
+                update[f"{key}__{field}"] = value
+
+        if field_errors:
+            raise ValidationError({"field-errors": field_errors, "errors": []})
+        return update
+
+    def prepare_patch_operation(self, operator, field, value):
+        """
+        Validate an update operation on a field, and return a tuple of the
+        MongoEngine update keyword (without the field name) and the cleaned
+        value.
+        """
+        doc_field = self.document._fields.get(field)
+        schema_field = self.schema and self.schema.get_fields().get(field)
+        if doc_field is None or (self.schema and not schema_field):
+            raise SchemaValidationError("Unknown field.")
+        if schema_field and schema_field.read_only:
+            raise SchemaValidationError("Value cannot be changed.")
+        key = PATCH_OPERATORS[operator]
+
+        if operator == "$set":
+            return key, self._clean_patch_value(schema_field, doc_field, value)
+
+        if operator == "$unset":
+            if (schema_field or doc_field).required:
+                raise SchemaValidationError("This field is required.")
+            return key, True
+
+        if operator == "$inc":
+            if not isinstance(
+                doc_field, (IntField, LongField, FloatField, DecimalField)
+            ):
+                raise SchemaValidationError("Only numbers can be incremented.")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise SchemaValidationError("Value must be a number.")
+            return key, value
+
+        # $push, $pull and $addToSet
+        if not isinstance(doc_field, ListField):
+            raise SchemaValidationError("Value is not a list.")
+        schema_item_field = schema_field and schema_field.field_instance
+        if not isinstance(value, list):
+            return key, self._clean_patch_value(
+                schema_item_field, doc_field.field, value
+            )
+        value = [
+            self._clean_patch_value(schema_item_field, doc_field.field, item)
+            for item in value
+        ]
+        return {"$push": "push_all", "$pull": "pull_all"}.get(operator, key), value
+
+    def _clean_patch_value(self, schema_field, doc_field, value):
+        if schema_field:
+            try:
+                return schema_field.clean(value)
+            except StopValidation as e:
+                return e.args and e.args[0]
+        value = doc_field.to_python(value)
+        doc_field.validate(value)
+        return value
+
+    def patch_object(self, pk, qfilter=None):
+        """
+        Apply the update of a PATCH request (see `get_patch_update`) to the
+        object with the given PK in a single `find_one_and_update`, without
+        loading it first, and return the updated object. Only the fields
+        which get serialized are loaded back. An optional queryset filter
+        function restricts the objects which can be updated.
+        """
+        update = self.get_patch_update()
+        qs = self.apply_parent_filter(self.get_queryset()).filter(pk=pk)
+        if qfilter:
+            qs = qfilter(qs)
+
+        requested_fields = self.get_requested_fields(params=self.params)
+        doc_fields = set(self.document._fields)
+        if self.wants_minimal_response():
+            requested_fields = []
+            qs = qs.only(self.document._meta["id_field"])
+        elif (
+            not self._child_document_resources
+            and set(requested_fields) <= doc_fields
+            and set(requested_fields) != doc_fields
+        ):
+            qs = qs.only(*requested_fields)
+
+        if update:
+            obj = qs.modify(new=True, **update)
+        else:
+            obj = qs.first()
+        if obj is None:
+            raise self.document.DoesNotExist(
+                f"{self.document.__name__} matching query does not exist."
+            )
+
+        self.fetch_related_resources([obj], requested_fields)
+        return obj
+
+    def bulk_update_objects(self, qfilter=None):
+        """
+        Validate the payload of a bulk update once (like a PATCH request's,
+        see `get_patch_update`) and apply it to all the objects matching the
+        request's filters with a single `update_many`, without loading them.
+        Return the number of matched objects (including those the update
+        leaves unchanged, like a regular bulk update counts all the objects
+        it processes), not the number of modified ones. An optional queryset
+        filter function restricts the objects which can be updated.
+
+        Like a regular bulk update, the payload can only set fields: update
+        operators are rejected.
+        """
+        for key in self.raw_data:
+            if key.startswith("$"):
+                raise ValidationError(
+                    {"error": f'"{key}" is not supported by bulk updates.'}
+                )
+        update = self.get_patch_update()
+        qs = self.apply_parent_filter(self.get_queryset())
+        qs = self.apply_filters(qs, self.params)
+
+        # Enforce the limit with a count rather than by loading the objects
+        if (
+            qs.limit(self.bulk_update_limit).count(with_limit_and_skip=True)
+            >= self.bulk_update_limit
+        ):
+            raise ValidationError(
+                {
+                    "errors": [
+                        f"It's not allowed to update more than {self.bulk_update_limit} objects at once"
+                    ]
+                }
+            )
+
+        # The filter function may load the (limited number of) objects if the
+        # view checks a per-object change permission, see the view's
+        # `has_patch_permission`
+        if qfilter:
+            qs = qfilter(qs)
+
+        if not update:
+            return qs.count()
+        return qs.update(**update)
+
     def delete_object(self, obj, parent_resources=None):
         obj.delete()
+
+    def bulk_delete_objects(self, qfilter=None):
+        """
+        Delete all the objects matching the request's filters, in batches of
+        `bulk_delete_batch_size` ids, without loading them (unless the filter
+        function does), and return the number of deleted objects. An optional
+        queryset filter function restricts the objects which can be deleted.
+        """
+        qs = self.apply_parent_filter(self.get_queryset())
+        qs = self.apply_filters(qs, self.params)
+
+        id_field = self.document._meta["id_field"]
+        ids = list(qs.limit(self.bulk_delete_limit).scalar(id_field))
+        if len(ids) >= self.bulk_delete_limit:
+            raise ValidationError(
+                {
+                    "errors": [
+                        f"It's not allowed to delete more than {self.bulk_delete_limit} objects at once"
+                    ]
+                }
+            )
+
+        # The filter function may load the (limited number of) objects, and
+        # must be applied to all of them before any of them is deleted
+        if qfilter:
+            qs = qfilter(qs.filter(pk__in=ids))
+
+        count = 0
+        for i in range(0, len(ids), self.bulk_delete_batch_size):
+            # Objects which stopped matching the filters in the meantime
+            # aren't deleted
+            batch_qs = qs.clone().filter(
+                pk__in=ids[i : i + self.bulk_delete_batch_size]
+            )
+            if self.bulk_delete_rules:
+                count += batch_qs.delete()
+            else:
+                count += batch_qs._collection.delete_many(
+                    batch_qs._query, collation=batch_qs._collation
+                ).deleted_count
+        return count
@@ -0,0 +1,214 @@
+"""
+Flask-MongoRest query shape statistics.
+
+Collects statistics about the queries resources actually run, grouped by
+their normalized shape: the filtered fields and operators, the ordering and
+a bucket of the limit, with all the values stripped. For example:
+
+    PostResource title:in !author:exact sort=-created limit<=100
+
+To enable it, share a collector between resources:
+
+    query_stats = QueryShapeStats(path='/var/log/api/query_shapes.jsonl')
+
+    class PostResource(Resource):
+        query_stats = query_stats
+
+Statistics are aggregated in memory (the number of distinct shapes is
+bounded, anything beyond `max_shapes` is counted under an "<other>" shape)
+and are periodically flushed to a JSON lines file and/or a MongoDB
+collection, from a background thread so that requests don't wait for the
+writes. The top shapes by total time can then be listed with:
+
+    python -m flask_mongorest.stats /var/log/api/query_shapes.jsonl --top 20
+"""
+
+import argparse
+import bisect
+import copy
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OTHER_SHAPE = "<other>"
+
+# Upper bounds of the histogram buckets (the last bucket is unbounded)
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+ROW_BUCKETS = [0, 1, 10, 100, 1000, 10000, 100000]
+LIMIT_BUCKETS = [1, 10, 25, 50, 100, 250, 500, 1000]
+
+
+def limit_bucket(limit):
+    """Return a label for the bucket a `_limit` value falls into."""
+    index = bisect.bisect_left(LIMIT_BUCKETS, limit)
+    if index == len(LIMIT_BUCKETS):
+        return f">{LIMIT_BUCKETS[-1]}"
+    return f"<={LIMIT_BUCKETS[index]}"
+
+
+def query_shape(resource_name, filters, ordering, limit):
+    """
+    Return the normalized shape of a query, given the name of the resource,
+    a list of `(field, operator name, negate)` filters, the ordering and the
+    limit (if any).
+    """
+    parts = [resource_name]
+    parts.extend(
+        sorted(f"{'!' if negate else ''}{field}:{op}" for field, op, negate in filters)
+    )
+    if ordering:
+        parts.append(f"sort={ordering}")
+    if limit is not None:
+        parts.append(f"limit{limit_bucket(limit)}")
+    return " ".join(parts)
+
+
+def _histogram(buckets):
+    return [0] * (len(buckets) + 1)
+
+
+class QueryShapeStats:
+    """
+    Thread-safe, in-memory aggregation of query statistics per shape.
+    """
+
+    def __init__(self, path=None, collection=None, flush_interval=60, max_shapes=1000):
+        self.path = path
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._shapes = {}
+        self._last_flush = time.monotonic()
+        self._flush_thread = None
+
+    def record(self, shape, latency_ms, returned, examined=None):
+        """
+        Record a query of the given shape which took `latency_ms` and
+        returned `returned` rows, having examined `examined` documents (if
+        known, e.g. from a query plan).
+        """
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                if len(self._shapes) >= self.max_shapes:
+                    shape = OTHER_SHAPE
+                entry = self._shapes.setdefault(
+                    shape,
+                    {
+                        "count": 0,
+                        "total_ms": 0.0,
+                        "max_ms": 0.0,
+                        "returned": 0,
+                        "latency_ms": _histogram(LATENCY_BUCKETS_MS),
+                        "returned_rows": _histogram(ROW_BUCKETS),
+                        "examined_rows": _histogram(ROW_BUCKETS),
+                    },
+                )
+            entry["count"] += 1
+            entry["total_ms"] += latency_ms
+            entry["max_ms"] = max(entry["max_ms"], latency_ms)
+            entry["returned"] += returned
+            entry["latency_ms"][bisect.bisect_left(LATENCY_BUCKETS_MS, latency_ms)] += 1
+            entry["returned_rows"][bisect.bisect_left(ROW_BUCKETS, returned)] += 1
+            if examined is not None:
+                entry["examined_rows"][bisect.bisect_left(ROW_BUCKETS, examined)] += 1
+
+            # Flush in the background (once at a time), so that the request
+            # recording the query doesn't wait for the writes
+            if (
+                (self.path or self.collection is not None)
+                and time.monotonic() - self._last_flush >= self.flush_interval
+                and not (self._flush_thread and self._flush_thread.is_alive())
+            ):
+                self._flush_thread = threading.Thread(
+                    target=self._background_flush, daemon=True
+                )
+                self._flush_thread.start()
+
+    def _background_flush(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Failed to flush the query shape statistics")
+
+    def snapshot(self):
+        """Return a copy of the statistics aggregated since the last flush."""
+        with self._lock:
+            return copy.deepcopy(self._shapes)
+
+    def flush(self):
+        """
+        Write the aggregated statistics to the configured file and/or
+        collection, and start aggregating from scratch.
+        """
+        with self._lock:
+            shapes, self._shapes = self._shapes, {}
+            self._last_flush = time.monotonic()
+        if not shapes:
+            return
+
+        timestamp = time.time()
+        rows = [
+            dict(entry, shape=shape, timestamp=timestamp)
+            for shape, entry in shapes.items()
+        ]
+        if self.path:
+            with open(self.path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+        if self.collection is not None:
+            self.collection.insert_many(rows, ordered=False)
+
+
+def top_shapes(rows, top=20):
+    """
+    Merge flushed statistics rows by shape and return the `top` shapes by
+    total time as `(shape, merged entry)` tuples.
+    """
+    merged = {}
+    for row in rows:
+        entry = merged.get(row["shape"])
+        if entry is None:
+            merged[row["shape"]] = {
+                k: copy.copy(v)
+                for k, v in row.items()
+                if k not in ("shape", "timestamp", "_id")
+            }
+            continue
+        entry["count"] += row["count"]
+        entry["total_ms"] += row["total_ms"]
+        entry["max_ms"] = max(entry["max_ms"], row["max_ms"])
+        entry["returned"] += row["returned"]
+        for key in ("latency_ms", "returned_rows", "examined_rows"):
+            entry[key] = [a + b for a, b in zip(entry[key], row[key])]
+    return sorted(merged.items(), key=lambda item: -item[1]["total_ms"])[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List the query shapes taking the most total time."
+    )
+    parser.add_argument("path", help="JSON lines file written by QueryShapeStats")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with open(args.path) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+
+    print(
+        f"{'total ms':>12} {'count':>8} {'avg ms':>9} {'max ms':>9} {'avg rows':>9}  shape"
+    )
+    for shape, entry in top_shapes(rows, args.top):
+        count = entry["count"]
+        print(
+            f"{entry['total_ms']:>12.1f} {count:>8} {entry['total_ms'] / count:>9.1f} "
+            f"{entry['max_ms']:>9.1f} {entry['returned'] / count:>9.1f}  {shape}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,26 @@
 import datetime
 import decimal
+import functools
 import json
+import operator
+import weakref
 
 import mongoengine
 from bson.dbref import DBRef
+from bson.errors import InvalidId
 from bson.objectid import ObjectId
+from mongoengine.base import BaseField
+from mongoengine.fields import (
+    BooleanField,
+    DateTimeField,
+    EmbeddedDocumentField,
+    IntField,
+    ListField,
+    LongField,
+    ObjectIdField,
+    ReferenceField,
+    StringField,
+)
 
 isbound = lambda m: getattr(m, "im_self", None) is not None
 
@@ -32,25 +48,6 @@ class MongoEncoder(json.JSONEncoder):
         return super(MongoEncoder, self).default(value, **kwargs)
 
 
-def cmp(a, b):
-    return (a > b) - (a < b)
-
-
-def cmp_fields(ordering):
-    # Takes a list of fields and directions and returns a
-    # comparison function for sorted() to perform client-side
-    # sorting.
-    # Example: sorted(objs, cmp_fields([('date_created', -1)]))
-    def _cmp(x, y):
-        for field, direction in ordering:
-            result = cmp(getattr(x, field), getattr(y, field)) * direction
-            if result:
-                return result
-        return 0
-
-    return _cmp
-
-
 def equal(a, b):
     """
     Compare two objects. In addition to the "==" operator, this function
@@ -61,15 +58,18 @@ def equal(a, b):
     # When comparing dicts (we serialize documents using to_dict) or lists
     # we may encounter datetime instances in the values, so compare them item
     # by item.
+    if a is b:
+        return True
+
     if isinstance(a, dict) and isinstance(b, dict):
-        if sorted(a.keys()) != sorted(b.keys()):
+        if a.keys() != b.keys():
             return False
         return all(equal(b[k], v) for k, v in a.items())
 
     if isinstance(a, list) and isinstance(b, list):
         if len(a) != len(b):
             return False
-        return all([equal(m, n) for (m, n) in zip(a, b)])
+        return all(map(equal, a, b))
 
     # Two mongoengine objects are equal if their ID is equal. However,
     # in this case we want to check if the data is equal. Note this
@@ -97,3 +97,241 @@ def equal(a, b):
         return a == b
     except Exception:  # Exception during comparison, mainly datetimes.
         return False
+
+
+def reference_id(value):
+    """
+    Return the id of a referenced document, given a reference as stored in
+    a document's `_data` (a DBRef, a document or an id) or a document.
+    """
+    if isinstance(value, DBRef):
+        return value.id
+    return getattr(value, "pk", value)
+
+
+def field_comparator(field):
+    """
+    Return an `equal(stored, value)` function which compares the value stored
+    in a document's field (as found in its `_data`) with a new value,
+    specialized for the field's type:
+
+    * strings, numbers, booleans and ObjectIds are compared with "==",
+    * references are compared by id, so that stored references (ObjectIds,
+      DBRefs or documents) don't need to be dereferenced, and unsaved
+      documents never equal anything else,
+    * embedded documents and lists are compared field by field and item by
+      item, with the comparators of their fields.
+
+    Anything else is compared with `equal`.
+    """
+    if isinstance(
+        field, (StringField, IntField, LongField, BooleanField, ObjectIdField)
+    ):
+        return operator.eq
+
+    if isinstance(field, ReferenceField):
+
+        def reference_equal(a, b):
+            if a is b:
+                return True
+            a_id, b_id = reference_id(a), reference_id(b)
+            # An unsaved document has no id yet, but it's still a change from
+            # (or to) no reference at all
+            if (a_id is None and a is not None) or (b_id is None and b is not None):
+                return False
+            return a_id == b_id
+
+        return reference_equal
+
+    if isinstance(field, EmbeddedDocumentField):
+        document_type = field.document_type
+        # Built on first use, as embedded documents may be recursive.
+        comparators = {}
+
+        def embedded_equal(a, b):
+            if a is b:
+                return True
+            if type(a) is not document_type or type(b) is not document_type:
+                return equal(a, b)
+            if not comparators:
+                comparators.update(
+                    (name, field_comparator(f))
+                    for name, f in document_type._fields.items()
+                )
+            return all(
+                compare(a._data.get(name), b._data.get(name))
+                for name, compare in comparators.items()
+            )
+
+        return embedded_equal
+
+    if isinstance(field, ListField) and field.field is not None:
+        item_equal = field_comparator(field.field)
+
+        def list_equal(a, b):
+            if a is b:
+                return True
+            if not isinstance(a, list) or not isinstance(b, list):
+                return equal(a, b)
+            return len(a) == len(b) and all(map(item_equal, a, b))
+
+        return list_equal
+
+    return equal
+
+
+def query_value_coercer(field):
+    """
+    Return a `coerce(op, value)` function which converts a query value into
+    its MongoDB representation, like `field.prepare_query_value` does.
+
+    Values coming from a querystring are strings (or None), so the common
+    field types get a fast path for those. Anything else is delegated to the
+    field. A ValueError is raised for values which can't be converted, in
+    which case MongoEngine should be left to handle (and report) them.
+    """
+    prepare = field.prepare_query_value
+
+    if isinstance(field, ObjectIdField):
+
+        def to_mongo(value):
+            try:
+                return ObjectId(value)
+            except (InvalidId, TypeError):
+                raise ValueError(value)
+
+    elif isinstance(field, ReferenceField):
+        document_type = field.document_type
+        id_field = document_type._fields[document_type._meta["id_field"]]
+        if document_type._meta.get("abstract") or not isinstance(
+            id_field, ObjectIdField
+        ):
+            return prepare
+        coerce_id = query_value_coercer(id_field)
+
+        if field.dbref:
+            collection = document_type._get_collection_name()
+            to_mongo = lambda value: DBRef(collection, coerce_id(None, value))
+        else:
+            to_mongo = lambda value: coerce_id(None, value)
+
+    elif isinstance(field, DateTimeField):
+        to_mongo = field.to_mongo
+
+    elif isinstance(field, IntField):
+        to_mongo = int
+
+    # Subclasses of StringField (e.g. EmailField) may validate or convert
+    # the values, so only plain StringFields skip `prepare_query_value`
+    elif type(field) is StringField or (
+        getattr(prepare, "__func__", None) is BaseField.prepare_query_value
+    ):
+
+        def coerce(op, value):
+            # These only convert values for regex based operators
+            if op is None or op in COMPARISON_QUERY_OPERATORS:
+                return value
+            return prepare(op, value)
+
+        return coerce
+
+    else:
+        return prepare
+
+    def coerce(op, value):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            return prepare(op, value)
+        return to_mongo(value)
+
+    return coerce
+
+
+# MongoEngine operators for which StringField values are used as is
+COMPARISON_QUERY_OPERATORS = ("ne", "lt", "lte", "gt", "gte", "in", "nin")
+
+
+def merge_raw_query(query, fragment):
+    """
+    Merge a raw query fragment (e.g. `{'date': {'$gte': x}}`) into a raw
+    MongoDB query in place. Conditions on a field which is already in the
+    query are merged if both of them are operator dicts, or added to an
+    `$and` clause otherwise.
+    """
+    for key, value in fragment.items():
+        if key not in query:
+            query[key] = value
+            continue
+        current = query[key]
+        if (
+            isinstance(current, dict)
+            and isinstance(value, dict)
+            and all(k.startswith("$") for k in current)
+            and all(k.startswith("$") for k in value)
+            and not set(current) & set(value)
+        ):
+            query[key] = {**current, **value}
+        else:
+            query.setdefault("$and", []).append({key: value})
+
+
+@functools.lru_cache(maxsize=256)
+def parse_fields(value):
+    """
+    Parse a `_fields` param, in which fields can have a nested selection of
+    their own fields, e.g. 'id,author(id,name),comments(id,author(name))'.
+    Return a dict mapping the field names to their nested selection (or
+    None), e.g. {'id': None, 'author': 'id,name', 'comments': 'id,author(name)'}.
+    Raise a ValueError if the parentheses aren't balanced.
+
+    The result is cached, so it mustn't be modified.
+    """
+    fields = {}
+    depth = 0
+    start = 0
+    name = None
+    for i, char in enumerate(value + ","):
+        if char == "(":
+            if depth == 0:
+                if name is not None:
+                    raise ValueError(value)
+                name = value[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                raise ValueError(value)
+            if depth == 0:
+                fields[name] = value[start:i]
+                start = i + 1
+        elif char == "," and depth == 0:
+            if name is None:
+                field = value[start:i].strip()
+                if field:
+                    fields[field] = None
+            elif value[start:i].strip():
+                # Something between the closing parenthesis and the comma
+                raise ValueError(value)
+            name = None
+            start = i + 1
+    if depth != 0:
+        raise ValueError(value)
+    return fields
+
+
+# Versions of the MongoDB servers of the clients seen so far
+_server_versions: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def server_version(collection):
+    """
+    Return the version of the MongoDB server of a collection as a tuple of
+    ints, e.g. (5, 0, 3). It's only fetched once per client.
+    """
+    client = collection.database.client
+    if client not in _server_versions:
+        version_array = client.server_info()["versionArray"]
+        _server_versions[client] = tuple(version_array[:3])
+    return _server_versions[client]
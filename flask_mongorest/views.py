@@ -1,16 +1,21 @@
+import concurrent.futures
 import json
-from typing import List, Type
+import sys
+from typing import List, Optional, Type
 
 import mimerender
 import mongoengine
-from flask import render_template, request
+from flask import current_app, render_template, request
 from flask.views import MethodView
-from werkzeug.exceptions import NotFound, Unauthorized
+from pymongo.errors import ExecutionTimeout
+from werkzeug.exceptions import HTTPException, NotFound, Unauthorized
+from werkzeug.routing import RequestRedirect, RoutingException
 
 from flask_mongorest import methods
 from flask_mongorest.authentication import AuthenticationBase
-from flask_mongorest.exceptions import ValidationError
+from flask_mongorest.exceptions import QueryTimeout, ValidationError
 from flask_mongorest.methods import METHODS_TYPE
+from flask_mongorest.resources import IncludedObjects
 from flask_mongorest.utils import MongoEncoder
 
 mimerender = mimerender.FlaskMimeRender()
@@ -54,10 +59,46 @@ def serialize_mongoengine_validation_error(e):
         return {"error": get_exception_message(e)}
 
 
+# WSGI environ key of the authentication results shared by the sub-requests
+# of a batch
+AUTHORIZED_ENVIRON_KEY = "flask_mongorest.authorized"
+
+
+def is_authorized(authentication_methods, cache=None):
+    """
+    Return whether any of the given authentication methods authorizes the
+    current request (or whether there are no authentication methods). If a
+    `cache` dict is given, each method's result is stored in (and reused
+    from) it, so that a method only runs once for all the sub-requests of a
+    batch.
+    """
+    authorized = bool(len(authentication_methods) == 0)
+    for authentication_method in authentication_methods:
+        if cache is None:
+            result = authentication_method().authorized()
+        else:
+            if authentication_method not in cache:
+                cache[authentication_method] = authentication_method().authorized()
+            result = cache[authentication_method]
+        if result:
+            authorized = True
+    return authorized
+
+
 class ResourceView(MethodView):
     resource = None
     methods: List[METHODS_TYPE] = []  # type: ignore
     authentication_methods: List[Type[AuthenticationBase]] = []
+    # The view of the parent objects, for a view nested under it (e.g.
+    # `/user/<parent_pk>/posts/`), and the reference field of this view's
+    # documents pointing to the parent
+    parent: Optional[Type["ResourceView"]] = None
+    parent_field: Optional[str] = None
+    # Fields of the objects loaded to check `has_change_permission` or
+    # `has_delete_permission` on the objects targeted by PATCH requests,
+    # in-place bulk updates and bulk deletes (see `check_object_permission`),
+    # e.g. ["owner"]. None means whole documents are loaded.
+    permission_fields: Optional[List[str]] = None
 
     def __init__(self):
         assert self.resource and self.methods
@@ -71,15 +112,19 @@ class ResourceView(MethodView):
         return self._dispatch_request(*args, **kwargs)
 
     def _dispatch_request(self, *args, **kwargs):
-        authorized = bool(len(self.authentication_methods) == 0)
-        for authentication_method in self.authentication_methods:
-            if authentication_method().authorized():
-                authorized = True
+        authorized = is_authorized(
+            self.authentication_methods, request.environ.get(AUTHORIZED_ENVIRON_KEY)
+        )
         if not authorized:
             return {"error": "Unauthorized"}, "401 Unauthorized"
 
+        parent_pk = kwargs.pop("parent_pk", None)
         try:
             self._resource = self.requested_resource(request)
+            if self.parent is not None:
+                self._resource.parent_filter = {
+                    self.parent_field: self.get_parent(parent_pk)
+                }
             return super(ResourceView, self).dispatch_request(*args, **kwargs)
         except mongoengine.queryset.DoesNotExist as e:
             return {"error": "Empty query: " + str(e)}, "404 Not Found"
@@ -89,6 +134,11 @@ class ResourceView(MethodView):
             return {"error": "Unauthorized"}, "401 Unauthorized"
         except NotFound as e:
             return {"error": str(e)}, "404 Not Found"
+        except (QueryTimeout, ExecutionTimeout):
+            return (
+                {"error": "The request exceeded its time budget."},
+                "504 Gateway Timeout",
+            )
 
     def handle_validation_error(self, e):
         if isinstance(e, ValidationError):
@@ -107,6 +157,22 @@ class ResourceView(MethodView):
         # Default behavior is to use the (base) resource class
         return self.resource()
 
+    def get_parent(self, parent_pk):
+        """
+        Return the parent object of a nested view's request, which must exist
+        and be readable through the parent view. Only its primary key is
+        loaded, as it's only used to filter this view's objects.
+        """
+        parent_view = self.parent()
+        document = parent_view.resource.document
+        qs = parent_view.has_read_permission(
+            request, parent_view.resource().get_queryset().clone()
+        )
+        try:
+            return qs.only(document._meta["id_field"]).get(pk=parent_pk)
+        except mongoengine.ValidationError:
+            raise NotFound(f"{document.__name__} {parent_pk} doesn't exist.")
+
     def get(self, **kwargs):
         pk = kwargs.pop("pk", None)
 
@@ -132,10 +198,20 @@ class ResourceView(MethodView):
             else:
                 raise ValueError("Unsupported value of resource.get_objects")
 
+            # Side-load the related objects if a compound document is asked
+            # for
+            serialize_kwargs = {}
+            if self._resource.wants_compound_document(request.args):
+                serialize_kwargs["included"] = IncludedObjects()
+
             data = []
             for obj in objs:
                 try:
-                    data.append(self._resource.serialize(obj, params=request.args))
+                    data.append(
+                        self._resource.serialize(
+                            obj, params=request.args, **serialize_kwargs
+                        )
+                    )
                 except Exception as e:
                     fixed_obj = self._resource.handle_serialization_error(e, obj)
                     if fixed_obj is not None:
@@ -144,6 +220,9 @@ class ResourceView(MethodView):
             # Serialize the objects one by one
             ret = {"data": data}
 
+            if "included" in serialize_kwargs:
+                ret["included"] = serialize_kwargs["included"]
+
             if has_more is not None:
                 ret["has_more"] = has_more
 
@@ -155,9 +234,19 @@ class ResourceView(MethodView):
         return ret
 
     def post(self, **kwargs):
+        if kwargs.pop("sync", False):
+            return self.sync()
+
         if "pk" in kwargs:
             raise NotFound("Did you mean to use PUT?")
 
+        # A list of objects is created in bulk
+        if methods.BulkCreate in self.methods and (
+            methods.Create not in self.methods
+            or request.get_data().lstrip().startswith(b"[")
+        ):
+            return self.bulk_create()
+
         # Set the view_method on a resource instance
         self._resource.view_method = methods.Create
 
@@ -171,12 +260,200 @@ class ResourceView(MethodView):
         if not self.has_add_permission(request, obj):
             raise Unauthorized
 
-        ret = self._resource.serialize(obj, params=request.args)
+        ret = self.serialize_written_object(obj)
+        headers = self.get_write_headers()
         if isinstance(obj, mongoengine.Document) and self._resource.uri_prefix:
-            return ret, "201 Created", {"Location": self._resource._url(str(obj.id))}
+            headers["Location"] = self._resource._url(str(obj.id))
+            return ret, "201 Created", headers
+        elif headers:
+            return ret, "200 OK", headers
         else:
             return ret
 
+    def bulk_create(self):
+        """
+        Create the objects of a JSON list in bulk. Each object is validated
+        (and checked with `has_add_permission`) before any of them is
+        inserted, with errors reported by index. By default, nothing is
+        created if any object is invalid, while with `_on_error=continue`
+        the valid objects are still created. The valid objects are then
+        inserted with a single unordered `insert_many`, so objects failing
+        to be written (e.g. because of a duplicate key) are reported by
+        index, while the others are still created. The per-object logic of
+        `save_object` (e.g. saving related objects) doesn't run.
+        """
+        self._resource.view_method = methods.BulkCreate
+        items = self._resource.raw_data
+        limit = self._resource.bulk_create_limit
+        if len(items) > limit:
+            raise ValidationError(
+                {
+                    "errors": [
+                        f"It's not allowed to create more than {limit} objects at once"
+                    ]
+                }
+            )
+        on_error = self._resource.params.get("_on_error", "stop")
+        if on_error not in ("stop", "continue"):
+            raise ValidationError(
+                {
+                    "error": f'_on_error must be "stop" or "continue" (got "{on_error}" instead).'
+                }
+            )
+
+        objs = []
+        errors = {}
+        for index, item in enumerate(items):
+            try:
+                objs.append((index, self.validate_new_object(item)))
+            except ValidationError as e:
+                errors[index] = e.args[0]
+            except Unauthorized:
+                errors[index] = {"error": "Unauthorized"}
+            if errors and on_error == "stop":
+                raise ValidationError({"errors": {str(index): errors[index]}})
+
+        insert_errors = self._resource.insert_objects([obj for _, obj in objs])
+        ids = [None] * len(items)
+        for position, (index, obj) in enumerate(objs):
+            if position in insert_errors:
+                errors[index] = {"error": insert_errors[position]}
+            else:
+                ids[index] = obj.pk
+
+        ret = {"ids": ids}
+        if errors:
+            ret["errors"] = {str(index): errors[index] for index in sorted(errors)}
+        headers = self.get_write_headers()
+        if headers:
+            return ret, "200 OK", headers
+        return ret
+
+    def sync(self):
+        """
+        Create or update the objects of a JSON list, identified by the
+        resource's `sync_key` field. The existing objects are fetched with a
+        single query and each item is validated against its object (as a PUT
+        would be), so that only the new and changed objects are written, with
+        a single unordered `bulk_write`. Return the outcome of each item:
+        "created", "updated", "unchanged" or "error". As with bulk creates,
+        the per-object logic of `save_object` doesn't run.
+        """
+        self._resource.view_method = methods.Sync
+        items = self._resource.raw_data
+        limit = self._resource.sync_limit
+        if len(items) > limit:
+            raise ValidationError(
+                {
+                    "errors": [
+                        f"It's not allowed to sync more than {limit} objects at once"
+                    ]
+                }
+            )
+
+        # Objects the view can't read can't be synced
+        qfilter = None
+        if type(self).has_read_permission is not ResourceView.has_read_permission:
+            qfilter = lambda qs: self.has_read_permission(request, qs.clone())
+        objs, errors = self._resource.get_sync_objects(items, qfilter=qfilter)
+        results = [None] * len(items)
+        operations = []
+        for index, obj in objs.items():
+            try:
+                obj = self.validate_sync_object(items[index], obj)
+            except ValidationError as e:
+                errors[index] = e.args[0]
+                continue
+            except Unauthorized:
+                errors[index] = {"error": "Unauthorized"}
+                continue
+            status = "created" if obj._created else "updated"
+            operation = self._resource.get_write_operation(obj)
+            if operation is None:
+                results[index] = {"status": "unchanged", "id": obj.pk}
+            else:
+                operations.append((index, obj, status, operation))
+
+        write_errors = self._resource.bulk_write(
+            [operation for _, _, _, operation in operations], ordered=False
+        )
+        for position, (index, obj, status, _operation) in enumerate(operations):
+            if position in write_errors:
+                errors[index] = {"error": write_errors[position]}
+                continue
+            obj._created = False
+            results[index] = {"status": status, "id": obj.pk}
+
+        for index, error in errors.items():
+            results[index] = {"status": "error", "errors": error}
+        ret = {"results": results}
+        headers = self.get_write_headers()
+        if headers:
+            return ret, "200 OK", headers
+        return ret
+
+    def validate_sync_object(self, data, obj):
+        """
+        Validate an item of a Sync request and return its new object, or its
+        existing object with the item's changes applied (but not saved).
+        """
+        if obj is None:
+            return self.validate_new_object(data)
+        self._resource._raw_data = data
+        self._resource.validate_request(obj)
+        try:
+            obj = self._resource.update_object(obj, save=False)
+            obj.validate()
+        except Exception as e:
+            self.handle_validation_error(e)
+
+        # Check if we have permission to change this object
+        if obj._get_changed_fields() and not self.has_change_permission(request, obj):
+            raise Unauthorized
+        return obj
+
+    def validate_new_object(self, data):
+        """
+        Validate the data of an object to create in bulk, and return the
+        (unsaved) object.
+        """
+        if not isinstance(data, dict):
+            raise ValidationError({"error": "JSON data must be a dict."})
+        self._resource._raw_data = data
+        self._resource.validate_request()
+        try:
+            obj = self._resource.create_object(save=False)
+            obj.validate()
+        except Exception as e:
+            self.handle_validation_error(e)
+
+        # Check if we have permission to create this object
+        if not self.has_add_permission(request, obj):
+            raise Unauthorized
+        return obj
+
+    def get_write_headers(self):
+        """
+        Return a dict of headers to include in the response to a request
+        which changed data.
+        """
+        headers = {}
+        token = self._resource.get_consistency_token()
+        if token is not None:
+            headers[self._resource.consistency_token_header] = token
+        if self._resource.wants_minimal_response():
+            headers["Preference-Applied"] = "return=minimal"
+        return headers
+
+    def serialize_written_object(self, obj):
+        """
+        Serialize an object which was created or updated, or only return its
+        id if the client asked for a minimal response.
+        """
+        if self._resource.wants_minimal_response():
+            return {"id": obj.pk}
+        return self._resource.serialize(obj, params=request.args)
+
     def process_object(self, obj):
         """Validate and update an object"""
         # Check if we have permission to change this object
@@ -215,18 +492,29 @@ class ResourceView(MethodView):
         else:
             self._resource.view_method = methods.BulkUpdate
 
-        if pk is None:
+        if pk is None and self._resource.bulk_update_in_place:
+            # Bulk update of a resource opting into in-place bulk updates: the
+            # payload is validated once and translated into a single update
+            # statement, which is applied either to all the objects or to none
+            # of them. Only the count of matched objects is returned, like the
+            # count of processed objects of a regular bulk update (objects the
+            # update left unchanged included). Objects the view can't read
+            # aren't updated.
+            qfilter = lambda qs: self.has_patch_permission(
+                request, self.has_read_permission(request, qs.clone())
+            )
+            try:
+                ret = {"count": self._resource.bulk_update_objects(qfilter=qfilter)}
+            except Exception as e:
+                self.handle_validation_error(e)
+        elif pk is None:
             # Bulk update where the body contains the new values for certain
             # fields.
 
-            # Currently, fetches all the objects and validates them separately.
-            # If one of them fails, a ValidationError for this object will be
-            # triggered.
-            # Ideally, this would be translated into an update statement for
-            # performance reasons and would perform the update either for all
-            # objects, or for none, if (generic) validation fails. Since this
-            # is a bulk update, only the count of objects which were updated is
-            # returned.
+            # Fetches all the objects and validates them separately. If one of
+            # them fails, a ValidationError for this object will be triggered.
+            # Since this is a bulk update, only the count of objects which
+            # were updated is returned.
 
             # Get a list of all objects matching the filters, capped at this
             # resource's `bulk_update_limit`
@@ -237,27 +525,66 @@ class ResourceView(MethodView):
                 objs, has_more, extra = result
 
             # Update all the objects and return their count
-            return self.process_objects(objs)
+            ret = self.process_objects(objs)
         else:
             obj = self._resource.get_object(pk)
             self.process_object(obj)
-            ret = self._resource.serialize(obj, params=request.args)
-            return ret
+            ret = self.serialize_written_object(obj)
 
-    def delete(self, **kwargs):
+        headers = self.get_write_headers()
+        if headers:
+            return ret, "200 OK", headers
+        return ret
+
+    def patch(self, **kwargs):
         pk = kwargs.pop("pk", None)
 
         # Set the view_method on a resource instance
-        self._resource.view_method = methods.Delete
+        self._resource.view_method = methods.Patch
+
+        # The update is applied to the matching object without loading it, so
+        # the permissions are checked by filtering the queryset. Objects the
+        # view can't read can't be patched either.
+        qfilter = lambda qs: self.has_patch_permission(
+            request, self.has_read_permission(request, qs.clone())
+        )
+        try:
+            obj = self._resource.patch_object(pk, qfilter=qfilter)
+        except Exception as e:
+            self.handle_validation_error(e)
 
-        obj = self._resource.get_object(pk)
+        ret = self.serialize_written_object(obj)
+        headers = self.get_write_headers()
+        if headers:
+            return ret, "200 OK", headers
+        return ret
 
-        # Check if we have permission to delete this object
-        if not self.has_delete_permission(request, obj):
-            raise Unauthorized
+    def delete(self, **kwargs):
+        pk = kwargs.pop("pk", None)
+
+        if pk is None:
+            # Bulk delete of the objects matching the filters, which aren't
+            # loaded. Only their count is returned.
+            self._resource.view_method = methods.BulkDelete
+            qfilter = lambda qs: self.has_bulk_delete_permission(request, qs.clone())
+            ret = {"count": self._resource.bulk_delete_objects(qfilter=qfilter)}
+        else:
+            # Set the view_method on a resource instance
+            self._resource.view_method = methods.Delete
+
+            obj = self._resource.get_object(pk)
+
+            # Check if we have permission to delete this object
+            if not self.has_delete_permission(request, obj):
+                raise Unauthorized
 
-        self._resource.delete_object(obj)
-        return {}
+            self._resource.delete_object(obj)
+            ret = {}
+
+        headers = self.get_write_headers()
+        if headers:
+            return ret, "200 OK", headers
+        return ret
 
     # This takes a QuerySet as an argument and then
     # returns a query set that this request can read
@@ -272,3 +599,261 @@ class ResourceView(MethodView):
 
     def has_delete_permission(self, request, obj):
         return True
+
+    def has_bulk_delete_permission(self, request, qs):
+        """
+        Return a queryset of the objects which can be deleted by a BulkDelete
+        request, given the queryset of the objects it targets. If the view
+        overrides `has_delete_permission`, these objects are loaded to check
+        it on each of them (only loading their `permission_fields` if set),
+        and nothing is deleted unless it holds for all of them. Views can
+        override this to filter the queryset instead, so that the objects
+        don't need to be loaded.
+        """
+        if type(self).has_delete_permission is ResourceView.has_delete_permission:
+            return qs
+        return self.check_object_permission(request, qs, self.has_delete_permission)
+
+    def has_patch_permission(self, request, qs):
+        """
+        Return a queryset of the objects which can be changed by a PATCH
+        request or an in-place bulk update (see
+        `Resource.bulk_update_in_place`), given the queryset of the readable
+        objects they target. If the view overrides `has_change_permission`,
+        these objects are loaded to check it on each of them (before the
+        update), like a PUT request would, only loading their
+        `permission_fields` if set. Views can override this to filter the
+        queryset instead, so that the objects don't need to be loaded.
+        """
+        if type(self).has_change_permission is ResourceView.has_change_permission:
+            return qs
+        return self.check_object_permission(request, qs, self.has_change_permission)
+
+    def check_object_permission(self, request, qs, has_permission):
+        """
+        Raise Unauthorized unless `has_permission(request, obj)` holds for
+        each object of a queryset, and return the queryset. Only the view's
+        `permission_fields` of the objects are loaded, if set.
+        """
+        objs = qs.clone()
+        if self.permission_fields is not None:
+            objs = objs.only(*self.permission_fields)
+        for obj in objs:
+            if not has_permission(request, obj):
+                raise Unauthorized
+        return qs
+
+
+class BatchView(MethodView):
+    """
+    Execute a list of sub-requests in a single HTTP request. The body is a
+    JSON list of sub-requests like:
+
+        {"method": "GET", "path": "/posts/", "params": {"_limit": 10}}
+        {"method": "POST", "path": "/posts/", "body": {"title": "Hello"}}
+
+    and the response contains, in order, the `status`, `headers` and `body`
+    of each sub-request's response. Only the paths of `ResourceView`s can be
+    requested, and a failing sub-request doesn't fail the others.
+
+    The sub-requests get the headers of the batch request, and each
+    authentication method only runs once for the whole batch (hence they
+    shouldn't rely on per-request side effects). Each sub-request gets its
+    own application context (and `g`). Identical GET sub-requests which
+    aren't separated by a write are only executed once, and if an
+    `executor` is set, consecutive GET sub-requests run concurrently.
+    """
+
+    # Maximum number of sub-requests in a batch
+    max_requests = 20
+    # Authentication methods required to send a batch at all
+    authentication_methods: List[Type[AuthenticationBase]] = []
+    # Executor running consecutive GET sub-requests concurrently
+    executor: Optional[concurrent.futures.Executor] = None
+    # Maximum number of seconds to wait for each group of concurrent GET
+    # sub-requests. The ones which aren't done by then get a 504 response
+    # (None means no limit).
+    timeout: Optional[float] = None
+
+    @mimerender(default="json", json=render_json, html=render_html)
+    def dispatch_request(self, *args, **kwargs):
+        return super(BatchView, self).dispatch_request(*args, **kwargs)
+
+    def post(self):
+        authorized = {}
+        if not is_authorized(self.authentication_methods, authorized):
+            return {"error": "Unauthorized"}, "401 Unauthorized"
+
+        try:
+            sub_requests = json.loads(request.data.decode("utf-8"))
+        except ValueError:
+            sub_requests = None
+        if not isinstance(sub_requests, list):
+            return (
+                {"error": "The body must be a list of requests."},
+                "400 Bad Request",
+            )
+        if len(sub_requests) > self.max_requests:
+            return (
+                {
+                    "error": "The number of requests is larger than the maximum "
+                    f"for a batch (max_requests = {self.max_requests})."
+                },
+                "400 Bad Request",
+            )
+
+        app = current_app._get_current_object()
+        headers = {
+            key: value
+            for key, value in request.headers.items()
+            if key.lower() not in ("accept", "content-length", "content-type")
+        }
+        headers["Accept"] = "application/json"
+        run = lambda sub_request: self.dispatch_sub_request(
+            app, sub_request, headers, authorized
+        )
+
+        responses = [None] * len(sub_requests)
+        reads = []
+        for index, sub_request in enumerate(sub_requests):
+            error = self.validate_sub_request(sub_request)
+            if error:
+                responses[index] = {"status": 400, "headers": {}, "body": error}
+            elif sub_request.get("method", "GET").upper() == "GET":
+                reads.append((index, sub_request))
+            else:
+                # Writes are executed in order, after the preceding reads
+                self.run_reads(reads, responses, run)
+                reads = []
+                responses[index] = run(sub_request)
+        self.run_reads(reads, responses, run)
+
+        return {"responses": responses}
+
+    def validate_sub_request(self, sub_request):
+        """
+        Return an error dict if a sub-request is malformed, or None.
+        """
+        if not isinstance(sub_request, dict):
+            return {"error": "Each request must be an object."}
+        path = sub_request.get("path")
+        if not isinstance(path, str) or not path.startswith("/"):
+            return {"error": "Each request must have an absolute path."}
+        if not isinstance(sub_request.get("method", "GET"), str):
+            return {"error": "The method of a request must be a string."}
+        if not isinstance(sub_request.get("params", {}), dict):
+            return {"error": "The params of a request must be an object."}
+        if "?" in path and sub_request.get("params"):
+            return {
+                "error": "A request can't have both a query string in its path and params."
+            }
+        return None
+
+    def run_reads(self, reads, responses, run):
+        """
+        Run a list of `(index, sub_request)` GET sub-requests, concurrently
+        if there's an executor, only executing identical ones once.
+        """
+        unique = {}
+        for index, sub_request in reads:
+            key = json.dumps(
+                [sub_request["path"], sub_request.get("params")], sort_keys=True
+            )
+            unique.setdefault(key, (sub_request, []))[1].append(index)
+
+        if self.executor is None or len(unique) < 2:
+            results = [run(sub_request) for sub_request, _ in unique.values()]
+        else:
+            futures = [
+                self.executor.submit(run, sub_request)
+                for sub_request, _ in unique.values()
+            ]
+            concurrent.futures.wait(futures, timeout=self.timeout)
+            results = []
+            for future in futures:
+                if future.done():
+                    results.append(future.result())
+                else:
+                    # A sub-request which already started can't be stopped,
+                    # but its response is no longer waited for
+                    future.cancel()
+                    results.append(
+                        {
+                            "status": 504,
+                            "headers": {},
+                            "body": {"error": "The request exceeded its time budget."},
+                        }
+                    )
+
+        for (_, indexes), result in zip(unique.values(), results):
+            for index in indexes:
+                responses[index] = result
+
+    def dispatch_sub_request(self, app, sub_request, headers, authorized):
+        """
+        Dispatch a sub-request through the application and return a dict
+        with the status, headers and body of its response.
+        """
+        body = sub_request.get("body")
+        # A fresh application context keeps sub-requests from sharing `g`
+        # with the batch request or with each other
+        with app.app_context(), app.test_request_context(
+            sub_request["path"],
+            method=sub_request.get("method", "GET").upper(),
+            query_string=sub_request.get("params"),
+            data=None if body is None else json.dumps(body, cls=MongoEncoder),
+            content_type="application/json",
+            headers=headers,
+            environ_base={AUTHORIZED_ENVIRON_KEY: authorized},
+        ):
+            e = request.routing_exception
+            if isinstance(e, RequestRedirect):
+                return {
+                    "status": e.code,
+                    "headers": {"Location": e.new_url},
+                    "body": None,
+                }
+            elif isinstance(e, HTTPException):
+                return {
+                    "status": e.code,
+                    "headers": {},
+                    "body": {"error": e.description},
+                }
+            elif isinstance(e, RoutingException):
+                return {
+                    "status": 404,
+                    "headers": {},
+                    "body": {"error": NotFound.description},
+                }
+
+            # Don't let batches call anything but resources (e.g. themselves)
+            view_func = app.view_functions[request.url_rule.endpoint]
+            view_class = getattr(view_func, "view_class", None)
+            if not (view_class and issubclass(view_class, ResourceView)):
+                return {
+                    "status": 404,
+                    "headers": {},
+                    "body": {"error": NotFound.description},
+                }
+
+            try:
+                response = app.full_dispatch_request()
+            except Exception:
+                # Unlike `app.handle_exception`, don't let the exception (or
+                # the app's 500 handler) fail the whole batch.
+                app.log_exception(sys.exc_info())
+                return {
+                    "status": 500,
+                    "headers": {},
+                    "body": {"error": "Internal Server Error"},
+                }
+
+            return {
+                "status": response.status_code,
+                "headers": {
+                    key: value
+                    for key, value in response.headers.items()
+                    if key.lower() not in ("content-length", "content-type")
+                },
+                "body": response.get_json(silent=True),
+            }
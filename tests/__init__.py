@@ -3,12 +3,33 @@
 import copy
 import datetime
 import json
+import os
+import re
+import tempfile
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 
+from bson import ObjectId
+from flask import Flask, request
 from mongoengine.context_managers import query_counter
 from mongoengine.errors import ValidationError
+from mongoengine.fields import EmailField, StringField
+from pymongo import ReadPreference
+from pymongo.errors import ExecutionTimeout
 
 import example.app as example
+from flask_mongorest import MongoRest, methods, operators as ops
+from flask_mongorest.exceptions import (
+    QueryTimeout,
+    ValidationError as RestValidationError,
+)
+from flask_mongorest.methods import Sync
+from flask_mongorest.resources import Resource
+from flask_mongorest.stats import QueryShapeStats, top_shapes
+from flask_mongorest.utils import field_comparator, query_value_coercer, server_version
+from flask_mongorest.views import ResourceView
 
 try:
     from mongoengine import SafeReferenceField
@@ -113,6 +134,7 @@ class MongoRestTestCase(unittest.TestCase):
         example.A.drop_collection()
         example.B.drop_collection()
         example.C.drop_collection()
+        example.D.drop_collection()
         example.MethodTestDoc.drop_collection()
         example.DictDoc.drop_collection()
 
@@ -161,6 +183,31 @@ class MongoRestTestCase(unittest.TestCase):
         data2 = resp_json(resp)
         self.assertEqual(data, data2)
 
+    def test_noop_update(self):
+        post = {
+            "title": "Title",
+            "author_id": self.user_1_obj["id"],
+            "tags": ["a", "b"],
+            "is_published": True,
+        }
+        resp = self.app.post("/posts/", data=json.dumps(post))
+        response_success(resp)
+        post_id = resp_json(resp)["id"]
+
+        # References are compared by id, and nothing is saved if nothing
+        # changed
+        resp = self.app.put(f"/unsaved_posts/{post_id}/", data=json.dumps(post))
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["author_id"], self.user_1_obj["id"])
+
+        post["author_id"] = self.user_2_obj["id"]
+        post["tags"] = ["a", "c"]
+        resp = self.app.put(f"/posts/{post_id}/", data=json.dumps(post))
+        response_success(resp)
+        obj = example.documents.Post.objects.get(pk=post_id)
+        self.assertEqual(str(obj.author.pk), self.user_2_obj["id"])
+        self.assertEqual(obj.tags, ["a", "c"])
+
     def test_unicode(self):
         """
         Make sure unicode data payloads are properly decoded.
@@ -760,6 +807,49 @@ class MongoRestTestCase(unittest.TestCase):
         user = resp_json(resp)
         self.assertEqual(set(user), {"id"})
 
+    def test_nested_fields(self):
+        self.post_2["content"] = {"text": "hello", "lang": "en"}
+        resp = self.app.post("/posts/", data=json.dumps(self.post_2))
+        response_success(resp)
+
+        resp = self.app.get("/posts/?_fields=title,content(text)")
+        response_success(resp)
+        self.assertEqual(
+            resp_json(resp)["data"],
+            [{"title": "Second post", "content": {"text": "hello"}}],
+        )
+
+        resp = self.app.get("/posts/?_fields=title,content(text")
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["error"],
+            '_fields has unbalanced parentheses (got "title,content(text" instead).',
+        )
+
+        # Only the requested fields of the related objects are loaded
+        class UserResource(example.UserResource):
+            fields = ["first_name", "posts"]
+            related_resources = {"posts": example.PostResource}
+            related_resources_hints = {"posts": "author"}
+
+        with example.app.test_request_context("/?_fields=posts(title)"):
+            resource = UserResource()
+            self.assertEqual(
+                resource.get_related_projection("posts", ["author"]),
+                {"title", "author"},
+            )
+
+            alan = example.documents.User.objects.get(first_name="alan")
+            example.documents.Post.objects.create(
+                title="Third post", description="not loaded", author=alan
+            )
+            resource.fetch_related_resources([alan], ["posts"])
+            self.assertEqual(
+                resource.serialize(alan, params={"_fields": "posts(title)"}),
+                {"posts": [{"title": "Third post"}]},
+            )
+            self.assertIsNone(alan.posts[0].description)
+
     def test_invalid_json(self):
         resp = self.app.post("/user/", data='{"}')
         response_error(resp, code=400)
@@ -1069,6 +1159,1225 @@ class MongoRestTestCase(unittest.TestCase):
         response_error(resp)
         self.assertEqual(resp.data, b"Invalid Accept header requested")
 
+    def test_check_indexes(self):
+        report = example.api.check_indexes()
+        self.assertEqual(
+            [spec["keys"] for spec in report["post"]["missing"]],
+            [[("title", 1)], [("author", 1)], [("is_published", 1)]],
+        )
+        self.assertEqual(
+            report["user"]["missing"],
+            [
+                {
+                    "keys": [("datetime", 1)],
+                    "collation": None,
+                    "reason": "filter on 'datetime'",
+                }
+            ],
+        )
+        # The unique index on the email isn't reported as unused
+        self.assertEqual(report["user"]["unused"], [])
+
+        example.documents.Post._get_collection().create_index("tags")
+        report = example.api.check_indexes(create_missing=True)
+        self.assertEqual(report["post"]["unused"], ["tags_1"])
+
+        report = example.api.check_indexes()
+        self.assertEqual(report["post"]["missing"], [])
+        self.assertEqual(report["user"]["missing"], [])
+
+    def test_time_budget(self):
+        resp = self.app.get("/deadline_posts/", headers={"X-Deadline-Ms": "soon"})
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["error"],
+            'X-Deadline-Ms must be a positive integer (got "soon" instead).',
+        )
+
+        resp = self.app.post("/posts/", data=json.dumps(self.post_2))
+        response_success(resp)
+        resp = self.app.get("/deadline_posts/", headers={"X-Deadline-Ms": "500"})
+        response_success(resp)
+        self.assertEqual(len(resp_json(resp)["data"]), 1)
+
+        resource = example.DeadlinePostResource()
+        with example.app.test_request_context(headers={"X-Deadline-Ms": "5000"}):
+            qs = resource.apply_time_budget(example.documents.Post.objects)
+            self.assertTrue(0 < qs._max_time_ms <= 1000)
+
+        resource = example.DeadlinePostResource()
+        with example.app.test_request_context(headers={"X-Deadline-Ms": "200"}):
+            qs = resource.apply_time_budget(example.documents.Post.objects)
+            self.assertTrue(0 < qs._max_time_ms <= 200)
+
+    def test_partial_results_with_related_resources(self):
+        documents = example.documents
+        alan = documents.User.objects.get(first_name="alan")
+        for title in ["b", "a"]:
+            documents.Post.objects.create(title=title, author=alan)
+
+        class PartialUserResource(Resource):
+            document = documents.User
+            fields = ["first_name", "posts"]
+            related_resources = {"posts": example.PostResource}
+            related_resources_hints = {"posts": "author"}
+            max_time_ms = 1000
+            partial_results = True
+
+            def apply_read_preference(self, qs):
+                qs = super().apply_read_preference(qs)
+                if qs._document is not documents.User:
+                    return qs
+
+                # Run out of time after fetching the first user
+                def timing_out():
+                    yield from qs.limit(1)
+                    self._deadline = time.monotonic()
+                    raise ExecutionTimeout("operation exceeded time limit")
+
+                return timing_out()
+
+        with example.app.test_request_context("/"):
+            resource = PartialUserResource(view_method=methods.List)
+            objs, has_more, extra = resource.get_objects()
+            self.assertEqual([obj.first_name for obj in objs], ["alan"])
+            self.assertEqual([post.title for post in objs[0].posts], ["a", "b"])
+            self.assertTrue(has_more)
+            self.assertEqual(extra, {"partial": True, "continuation": {"_skip": "1"}})
+
+        # Without time left to fetch the related objects, the page is empty
+        # but can still be continued.
+        with example.app.test_request_context("/"):
+            resource = PartialUserResource(view_method=methods.List)
+            resource.partial_results_grace_ms = 0
+            objs, has_more, extra = resource.get_objects()
+            self.assertEqual(objs, [])
+            self.assertEqual(extra, {"partial": True, "continuation": {"_skip": "0"}})
+
+    def test_read_preference(self):
+        resp = self.app.post("/read_preference_posts/", data=json.dumps(self.post_2))
+        response_success(resp)
+        token = resp.headers["X-Consistency-Token"]
+        post_id = resp_json(resp)["id"]
+
+        resp = self.app.get("/read_preference_posts/?_consistency=sometimes")
+        response_error(resp, code=400)
+
+        def read_preference(url, headers=None):
+            with example.app.test_request_context(url, headers=headers):
+                resource = example.ReadPreferencePostResource()
+                resource.view_method = (
+                    example.Fetch if url.endswith(f"{post_id}/") else example.List
+                )
+                return resource.get_read_preference()
+
+        url = "/read_preference_posts/"
+        self.assertEqual(read_preference(url), ReadPreference.SECONDARY_PREFERRED)
+        self.assertEqual(
+            read_preference(f"{url}{post_id}/"), ReadPreference.PRIMARY_PREFERRED
+        )
+        self.assertEqual(
+            read_preference(f"{url}?_consistency=strong"), ReadPreference.PRIMARY
+        )
+        self.assertEqual(
+            read_preference(url, headers={"X-Consistency-Token": token}),
+            ReadPreference.PRIMARY,
+        )
+        self.assertEqual(
+            read_preference(url, headers={"X-Consistency-Token": "0"}),
+            ReadPreference.SECONDARY_PREFERRED,
+        )
+
+        resp = self.app.get(f"{url}{post_id}/", headers={"X-Consistency-Token": token})
+        response_success(resp)
+
+        # Tokens from the future are rejected
+        resp = self.app.get(
+            url, headers={"X-Consistency-Token": str(float(token) + 3600)}
+        )
+        response_error(resp, code=400)
+
+    def test_fetch_related_resources(self):
+        documents = example.documents
+        alan = documents.User.objects.get(first_name="alan")
+        olivia = documents.User.objects.get(first_name="olivia")
+        nobody = documents.User.objects.create(email="3@b.com", first_name="nobody")
+        for title, author in [("b", alan), ("c", olivia), ("a", alan), ("d", None)]:
+            documents.Post.objects.create(title=title, author=author)
+
+        class UserResource(Resource):
+            document = documents.User
+            related_resources = {"posts": example.PostResource}
+            related_resources_hints = {"posts": "author"}
+            related_resources_chunk_size = 1
+
+        users = list(documents.User.objects.order_by("first_name"))
+        with example.app.test_request_context("/"):
+            UserResource().fetch_related_resources(users, ["posts"])
+
+        self.assertEqual([u.first_name for u in users], ["alan", "nobody", "olivia"])
+        self.assertEqual([p.title for p in users[0].posts], ["a", "b"])
+        self.assertEqual(users[1].posts, [])
+        self.assertEqual([p.title for p in users[2].posts], ["c"])
+
+        # Cap the number of posts prefetched for each user
+        class TitleResource(Resource):
+            document = documents.Post
+            fields = ["title"]
+
+        class CappedUserResource(UserResource):
+            fields = ["first_name", "posts", "posts_has_more"]
+            related_resources = {"posts": TitleResource}
+            related_resources_limits = {"posts": 1}
+
+        users = list(documents.User.objects.order_by("first_name"))
+        with example.app.test_request_context("/"):
+            resource = CappedUserResource()
+            resource.fetch_related_resources(users, ["posts"])
+            self.assertEqual(
+                [resource.serialize(user) for user in users],
+                [
+                    {
+                        "first_name": "alan",
+                        "posts": [{"title": "a"}],
+                        "posts_has_more": True,
+                    },
+                    {"first_name": "nobody", "posts": [], "posts_has_more": False},
+                    {
+                        "first_name": "olivia",
+                        "posts": [{"title": "c"}],
+                        "posts_has_more": False,
+                    },
+                ],
+            )
+
+        # Each user's posts are fetched with a limited query, which an index
+        # on the hint field and the ordering serves without reading the
+        # other posts.
+        for title in ["e", "f", "g"]:
+            documents.Post.objects.create(title=title, author=alan)
+        collection = documents.Post._get_collection()
+        collection.create_index([("author", 1), ("title", 1)])
+        users = list(documents.User.objects.order_by("first_name"))
+        with query_counter() as c, example.app.test_request_context("/"):
+            CappedUserResource().fetch_related_resources(users, ["posts"])
+            queries = list(
+                c.db.system.profile.find({"ns": collection.full_name, "op": "query"})
+            )
+        self.assertEqual([p.title for p in users[0].posts], ["a"])
+        self.assertTrue(users[0].posts_has_more)
+        self.assertEqual(len(queries), len(users))
+        self.assertTrue(all(query["docsExamined"] <= 2 for query in queries))
+
+        # Concurrent queries are limited to what's left of the time budget,
+        # so that the server aborts those the request stops waiting for
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        class ConcurrentUserResource(UserResource):
+            related_resources_executor = executor
+            max_time_ms = 5000
+
+        users = list(documents.User.objects.order_by("first_name"))
+        with query_counter() as c, example.app.test_request_context("/"):
+            ConcurrentUserResource().fetch_related_resources(users, ["posts"])
+            queries = list(
+                c.db.system.profile.find({"ns": collection.full_name, "op": "query"})
+            )
+        executor.shutdown()
+        self.assertEqual([p.title for p in users[2].posts], ["c"])
+        self.assertEqual(len(queries), len(users))
+        for query in queries:
+            command = query.get("command") or query["query"]
+            self.assertTrue(0 < command["maxTimeMS"] <= 5000)
+        nobody.delete()
+
+    def test_related_resources_lookup(self):
+        documents = example.documents
+        alan = documents.User.objects.get(first_name="alan")
+        for title, author in [("b", alan), ("a", alan), ("c", None)]:
+            documents.Post.objects.create(title=title, author=author)
+
+        class AuthorResource(Resource):
+            document = documents.User
+            fields = ["id", "first_name"]
+
+        class PostResource(Resource):
+            document = documents.Post
+            fields = ["title", "author"]
+            allowed_ordering = ["title"]
+            related_resources = {"author": example.UserResource}
+            related_resources_lookup = True
+
+        class UserResource(Resource):
+            document = documents.User
+            fields = ["first_name", "posts"]
+            related_resources = {"posts": example.PostResource}
+            related_resources_hints = {"posts": "author"}
+            related_resources_lookup = True
+
+        class CappedUserResource(UserResource):
+            fields = ["first_name", "posts", "posts_has_more"]
+            related_resources_limits = {"posts": 1}
+
+        with example.app.test_request_context("/?_order_by=title"):
+            resource = PostResource(view_method=methods.List)
+            objs, has_more = resource.get_objects()
+            self.assertEqual(
+                [(obj.title, obj._data["author"]) for obj in objs],
+                [("a", alan), ("b", alan), ("c", None)],
+            )
+            self.assertEqual(
+                resource.serialize(objs[0])["author"]["first_name"], "alan"
+            )
+
+        with example.app.test_request_context("/"):
+            resource = UserResource(view_method=methods.List)
+            objs, has_more = resource.get_objects()
+            self.assertEqual(
+                [[post.title for post in obj.posts] for obj in objs], [["a", "b"], []]
+            )
+
+            # Joins without a sub-pipeline are sorted and capped in Python
+            resource = CappedUserResource(view_method=methods.List)
+            objs, has_more = resource.get_objects()
+            self.assertEqual(
+                [(obj.first_name, [post.title for post in obj.posts]) for obj in objs],
+                [("alan", ["a"]), ("olivia", [])],
+            )
+            self.assertEqual([obj.posts_has_more for obj in objs], [True, False])
+
+        # The document's default ordering applies to the paginated pipeline
+        a = example.A.objects.create(txt="a")
+        for txt in ["b", "d", "a", "c"]:
+            example.D.objects.create(txt=txt, ref=a)
+
+        class DResource(Resource):
+            document = example.D
+            related_resources = {"ref": example.AResource}
+            related_resources_lookup = True
+
+        pages = []
+        for skip in ["0", "2"]:
+            with example.app.test_request_context(f"/?_limit=2&_skip={skip}"):
+                resource = DResource(view_method=methods.List)
+                objs, has_more = resource.get_objects()
+                self.assertIn("ref", resource.get_related_lookups(example.D.objects))
+                pages.append([(obj.txt, obj._data["ref"].txt) for obj in objs])
+        self.assertEqual(pages, [[("d", "a"), ("c", "a")], [("b", "a"), ("a", "a")]])
+
+        # Methods filtering on other attributes of the object can't be joined
+        documents.Post.objects.create(title="baker", author=alan)
+
+        class NamedPostsUserResource(UserResource):
+            fields = ["first_name", "named_posts"]
+            related_resources = {"named_posts": example.PostResource}
+            related_resources_hints = {"named_posts": "author"}
+
+        with example.app.test_request_context("/"):
+            resource = NamedPostsUserResource(view_method=methods.List)
+            lookups = resource.get_related_lookups(documents.User.objects)
+            self.assertNotIn("named_posts", lookups)
+            objs, has_more = resource.get_objects()
+            self.assertEqual(
+                [
+                    [post["title"] for post in resource.serialize(obj)["named_posts"]]
+                    for obj in objs
+                ],
+                [["baker"], []],
+            )
+
+    def test_related_resources_lookup_pipelines(self):
+        if server_version(example.documents.Post._get_collection()) < (5, 0):
+            self.skipTest("$lookup sub-pipelines require MongoDB 5.0+")
+
+        documents = example.documents
+
+        class AuthorResource(Resource):
+            document = documents.User
+            fields = ["id", "first_name"]
+
+        class ProjectedPostResource(Resource):
+            document = documents.Post
+            fields = ["title", "author"]
+            related_resources = {"author": AuthorResource}
+            related_resources_lookup = True
+
+        class CappedUserResource(Resource):
+            document = documents.User
+            fields = ["first_name", "posts"]
+            related_resources = {"posts": example.PostResource}
+            related_resources_hints = {"posts": "author"}
+            related_resources_limits = {"posts": 2}
+            related_resources_lookup = True
+
+        with example.app.test_request_context("/"):
+            lookups = ProjectedPostResource().get_related_lookups(
+                documents.Post.objects
+            )
+            self.assertEqual(
+                lookups["author"]["pipeline"],
+                [{"$project": {"_id": 1, "first_name": 1}}],
+            )
+
+            lookups = CappedUserResource().get_related_lookups(documents.User.objects)
+            self.assertEqual(
+                lookups["posts"]["pipeline"], [{"$sort": {"title": 1}}, {"$limit": 3}]
+            )
+
+    def test_compound_documents(self):
+        documents = example.documents
+        alan = documents.User.objects.get(first_name="alan")
+        olivia = documents.User.objects.get(first_name="olivia")
+        post_1 = documents.Post.objects.create(title="1", author=alan, editor=olivia)
+        post_2 = documents.Post.objects.create(title="2", author=alan)
+
+        resp = self.app.get("/compound_posts/?_compound=1")
+        response_success(resp)
+        data = resp_json(resp)
+        alan_ref = {"type": "User", "id": str(alan.pk)}
+        olivia_ref = {"type": "User", "id": str(olivia.pk)}
+        self.assertEqual(
+            data["data"],
+            [
+                {
+                    "id": str(post_1.pk),
+                    "title": "1",
+                    "author": alan_ref,
+                    "editor": olivia_ref,
+                },
+                {
+                    "id": str(post_2.pk),
+                    "title": "2",
+                    "author": alan_ref,
+                    "editor": None,
+                },
+            ],
+        )
+        self.assertEqual(set(data["included"]), {"User"})
+        self.assertEqual(set(data["included"]["User"]), {str(alan.pk), str(olivia.pk)})
+        compare_req_resp(self.user_1_obj, data["included"]["User"][str(alan.pk)])
+
+        # Related objects are embedded by default
+        resp = self.app.get("/compound_posts/")
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertNotIn("included", data)
+        compare_req_resp(self.user_1_obj, data["data"][0]["author"])
+
+        # An object reached with another field selection than the included
+        # one is serialized in place
+        post_2.editor = alan
+        post_2.save()
+        resp = self.app.get(
+            "/compound_posts/?_compound=1&_fields=id,author(id,email),editor(id,first_name)"
+        )
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertEqual(data["data"][1]["author"], alan_ref)
+        self.assertEqual(
+            data["data"][1]["editor"], {"id": str(alan.pk), "first_name": "alan"}
+        )
+        self.assertEqual(
+            data["included"]["User"][str(alan.pk)],
+            {"id": str(alan.pk), "email": "1@b.com"},
+        )
+
+    def test_polymorphic_list(self):
+        documents = example.documents
+        documents.Activity.drop_collection()
+        comment = documents.Comment.objects.create(note="note", text="hi")
+        call = documents.Call.objects.create(note="note", duration=60)
+
+        resp = self.app.get("/activities/")
+        response_success(resp)
+        self.assertEqual(
+            resp_json(resp)["data"],
+            [
+                {"id": str(comment.pk), "text": "hi"},
+                {"id": str(call.pk), "duration": 60},
+            ],
+        )
+
+        with example.app.test_request_context("/activities/"):
+            resource = example.ActivityResource(view_method=methods.List)
+
+            # Only the fields requested by the resources of the classes which
+            # can be returned are loaded
+            self.assertEqual(
+                resource.get_polymorphic_projection(documents.Activity.objects, {}),
+                {"id", "note", "text", "duration"},
+            )
+            self.assertEqual(
+                resource.get_polymorphic_projection(documents.Comment.objects, {}),
+                {"id", "text"},
+            )
+            objs, has_more = resource.get_objects(
+                qfilter=lambda qs: documents.Comment.objects
+            )
+            self.assertEqual(objs, [comment])
+            self.assertIsNone(objs[0].note)
+
+            # Sub-resources are reused for objects of the same class, without
+            # the state of the previous object
+            subresource = resource._subresource(comment)
+            self.assertIsInstance(subresource, example.CommentResource)
+            subresource._raw_data = {"text": "hello"}
+            subresource._dirty_fields = ["text"]
+            self.assertIs(resource._subresource(documents.Comment()), subresource)
+            self.assertFalse(hasattr(subresource, "_raw_data"))
+            self.assertIsNone(subresource._dirty_fields)
+
+        # Resources customizing the serialization of their fields may read
+        # other fields, so they get the whole documents
+        class NotedCallResource(example.CallResource):
+            def duration(self, obj):
+                return f"{obj.duration}s ({obj.note})"
+
+        class NotedCommentResource(example.CommentResource):
+            def serialize(self, obj, **kwargs):
+                return dict(super().serialize(obj, **kwargs), note=obj.note)
+
+        for child_resource, obj, expected in [
+            (NotedCallResource, call, {"id": str(call.pk), "duration": "60s (note)"}),
+            (
+                NotedCommentResource,
+                comment,
+                {"id": str(comment.pk), "text": "hi", "note": "note"},
+            ),
+        ]:
+
+            class NotedActivityResource(example.ActivityResource):
+                child_document_resources = {child_resource.document: child_resource}
+
+            with example.app.test_request_context("/activities/"):
+                resource = NotedActivityResource(view_method=methods.List)
+                self.assertIsNone(
+                    resource.get_polymorphic_projection(documents.Activity.objects, {})
+                )
+                objs, has_more = resource.get_objects(
+                    qfilter=lambda qs: type(obj).objects
+                )
+                self.assertEqual([resource.serialize(o) for o in objs], [expected])
+
+    def test_multi_get(self):
+        user_1_id, user_2_id = self.user_1_obj["id"], self.user_2_obj["id"]
+        unknown_id = str(ObjectId())
+        resp = self.app.get(
+            f"/user/?_ids={user_2_id},invalid,{user_1_id},{unknown_id},{user_2_id},bad"
+        )
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertEqual([user["id"] for user in data["data"]], [user_2_id, user_1_id])
+        # Missing ids are reported in the requested order too
+        self.assertEqual(data["missing"], ["invalid", unknown_id, "bad"])
+        self.assertNotIn("has_more", data)
+
+        # Other filters still apply
+        resp = self.app.get(
+            f"/user/?_ids={user_1_id},{user_2_id}&datetime=2012-11-09T11:00:00"
+        )
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertEqual([user["id"] for user in data["data"]], [user_2_id])
+        self.assertEqual(data["missing"], [user_1_id])
+
+        resp = self.app.get("/posts10/?_ids=" + ",".join(["x"] * 11))
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["error"],
+            "The number of ids you requested is larger than the maximum limit for this resource (max_limit = 10).",
+        )
+
+    def test_patch(self):
+        user_id = self.user_1_obj["id"]
+        resp = self.app.patch(
+            f"/user/{user_id}/",
+            data=json.dumps({"first_name": "alice", "$inc": {"balance": 5}}),
+        )
+        response_success(resp)
+        user = resp_json(resp)
+        self.assertEqual(user["first_name"], "alice")
+        self.assertEqual(user["balance"], 5)
+        self.assertEqual(user["email"], "1@b.com")
+
+        # Only the requested fields are loaded and returned
+        resp = self.app.patch(
+            f"/user/{user_id}/?_fields=id,balance",
+            data=json.dumps({"$inc": {"balance": -2}, "$unset": {"last_name": 1}}),
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"id": user_id, "balance": 3})
+        user = example.documents.User.objects.get(pk=user_id)
+        self.assertEqual(user.last_name, None)
+        self.assertEqual(user.first_name, "alice")
+
+        resp = self.app.post(
+            "/posts/", data=json.dumps({"title": "a", "is_published": True})
+        )
+        post_id = resp_json(resp)["id"]
+        resp = self.app.patch(
+            f"/posts/{post_id}/", data=json.dumps({"$push": {"tags": ["x", "y"]}})
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["tags"], ["x", "y"])
+        resp = self.app.patch(
+            f"/posts/{post_id}/",
+            data=json.dumps({"$addToSet": {"tags": "x"}, "$pull": {"user_lists": []}}),
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["tags"], ["x", "y"])
+        resp = self.app.patch(
+            f"/posts/{post_id}/", data=json.dumps({"$pull": {"tags": "x"}})
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["tags"], ["y"])
+
+        # Each operation is validated
+        resp = self.app.patch(
+            f"/user/{user_id}/",
+            data=json.dumps(
+                {
+                    "email": "invalid",
+                    "unknown": 1,
+                    "$inc": {"first_name": 1},
+                    "$unset": {"email": 1},
+                }
+            ),
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["field-errors"],
+            {
+                "email": "Invalid email address.",
+                "unknown": "Unknown field.",
+                "first_name": "Only numbers can be incremented.",
+            },
+        )
+        resp = self.app.patch(
+            f"/user/{user_id}/", data=json.dumps({"$rename": {"email": "e"}})
+        )
+        response_error(resp, code=400)
+        resp = self.app.patch(
+            f"/posts/{post_id}/", data=json.dumps({"tags": [], "$push": {"tags": "z"}})
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["field-errors"], {"tags": "Conflicting updates."}
+        )
+
+        resp = self.app.patch(f"/user/{ObjectId()}/", data=json.dumps({"balance": 1}))
+        response_error(resp, code=404)
+
+        # The view's change permission applies
+        resp = self.app.patch(
+            f"/restricted/{post_id}/", data=json.dumps({"title": "b"})
+        )
+        response_error(resp, code=401)
+        self.assertEqual(example.documents.Post.objects.get(pk=post_id).title, "a")
+
+        # Objects the view can't read can't be patched either
+        resp = self.app.post(
+            "/posts/", data=json.dumps({"title": "c", "is_published": False})
+        )
+        hidden_id = resp_json(resp)["id"]
+        resp = self.app.patch(
+            f"/restricted/{hidden_id}/", data=json.dumps({"title": "d"})
+        )
+        response_error(resp, code=404)
+        self.assertEqual(example.documents.Post.objects.get(pk=hidden_id).title, "c")
+
+        # Only the fields the permission check needs are loaded
+        checked = []
+        example.RestrictedPostView().check_object_permission(
+            None,
+            example.documents.Post.objects(pk=post_id),
+            lambda request, obj: checked.append(obj) or True,
+        )
+        self.assertEqual(
+            [(obj.title, obj.is_published) for obj in checked], [(None, True)]
+        )
+
+    def test_minimal_response(self):
+        resp = self.app.post(
+            "/user/",
+            data=json.dumps({"email": "3@b.com", "first_name": "john"}),
+            headers={"Prefer": "return=minimal"},
+        )
+        response_success(resp)
+        user_id = resp_json(resp)["id"]
+        self.assertEqual(resp_json(resp), {"id": user_id})
+        self.assertEqual(resp.headers["Preference-Applied"], "return=minimal")
+        self.assertEqual(
+            example.documents.User.objects.get(pk=user_id).first_name, "john"
+        )
+
+        for method in (self.app.put, self.app.patch):
+            resp = method(
+                f"/user/{user_id}/?_return=minimal",
+                data=json.dumps({"last_name": method.__name__}),
+            )
+            response_success(resp)
+            self.assertEqual(resp_json(resp), {"id": user_id})
+            self.assertEqual(
+                example.documents.User.objects.get(pk=user_id).last_name,
+                method.__name__,
+            )
+
+        # Without a reload, the in-memory object is serialized
+        resp = self.app.put(
+            f"/no_reload_users/{user_id}/", data=json.dumps({"first_name": "jack"})
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["first_name"], "jack")
+        self.assertEqual(resp_json(resp)["email"], "3@b.com")
+        self.assertNotIn("Preference-Applied", resp.headers)
+
+    def test_bulk_update_in_place(self):
+        resp = self.app.put(
+            "/in_place_users/?email__in=1@b.com,2@b.com,3@b.com",
+            data=json.dumps({"first_name": "bob"}),
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"count": 2})
+        self.assertEqual(
+            example.documents.User.objects.filter(first_name="bob").count(), 2
+        )
+
+        # The payload is validated once, and nothing is updated if it's invalid
+        resp = self.app.put(
+            "/in_place_users/?email__in=1@b.com,2@b.com,3@b.com",
+            data=json.dumps({"first_name": "joe", "email": "invalid"}),
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["field-errors"], {"email": "Invalid email address."}
+        )
+        self.assertEqual(
+            example.documents.User.objects.filter(first_name="bob").count(), 2
+        )
+
+        # Only plain field updates are supported, unlike PATCH requests
+        resp = self.app.put(
+            "/in_place_users/?email__in=1@b.com,2@b.com,3@b.com",
+            data=json.dumps({"$inc": {"balance": 1}}),
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp), {"error": '"$inc" is not supported by bulk updates.'}
+        )
+        self.assertEqual(
+            example.documents.User.objects.filter(balance__gt=0).count(), 0
+        )
+
+        # Objects the view can't read aren't updated
+        resp = self.app.put(
+            "/restricted_in_place_users/?email__in=1@b.com,2@b.com",
+            data=json.dumps({"first_name": "ann"}),
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"count": 1})
+        self.assertEqual(
+            [user.email for user in example.documents.User.objects(first_name="ann")],
+            ["1@b.com"],
+        )
+
+        # The limit is enforced with a count
+        example.documents.User.objects.create(email="3@b.com")
+        resp = self.app.put(
+            "/in_place_users/?email__in=1@b.com,2@b.com,3@b.com",
+            data=json.dumps({"first_name": "joe"}),
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp),
+            {"errors": ["It's not allowed to update more than 3 objects at once"]},
+        )
+        self.assertEqual(
+            example.documents.User.objects.filter(first_name="joe").count(), 0
+        )
+
+    def test_bulk_create(self):
+        resp = self.app.post(
+            "/user/", data=json.dumps([{"email": "3@b.com"}, {"email": "4@b.com"}])
+        )
+        response_success(resp)
+        ids = resp_json(resp)["ids"]
+        self.assertEqual(
+            [user.email for user in example.documents.User.objects.filter(pk__in=ids)],
+            ["3@b.com", "4@b.com"],
+        )
+
+        # Nothing is created if an object is invalid
+        resp = self.app.post(
+            "/user/", data=json.dumps([{"email": "5@b.com"}, {"email": "invalid"}])
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["errors"],
+            {"1": {"field-errors": {"email": "Invalid email address."}, "errors": []}},
+        )
+        self.assertEqual(example.documents.User.objects.count(), 4)
+
+        # Unless the valid objects should still be created
+        resp = self.app.post(
+            "/user/?_on_error=continue",
+            data=json.dumps(
+                [{"email": "5@b.com"}, {"email": "invalid"}, {"email": "1@b.com"}]
+            ),
+        )
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertEqual(data["ids"][1:], [None, None])
+        self.assertEqual(sorted(data["errors"]), ["1", "2"])
+        self.assertEqual(
+            example.documents.User.objects.get(pk=data["ids"][0]).email, "5@b.com"
+        )
+
+        # Objects failing to be written are reported, and the others are
+        # still created
+        resp = self.app.post(
+            "/user/",
+            data=json.dumps(
+                [{"email": "6@b.com"}, {"email": "1@b.com"}, {"email": "7@b.com"}]
+            ),
+        )
+        response_success(resp)
+        data = resp_json(resp)
+        self.assertEqual(data["ids"][1], None)
+        self.assertEqual(sorted(data["errors"]), ["1"])
+        self.assertEqual(
+            example.documents.User.objects(email__in=["6@b.com", "7@b.com"]).count(), 2
+        )
+
+        resp = self.app.post("/limited_bulk_users/", data=json.dumps([{}, {}]))
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp),
+            {"errors": ["It's not allowed to create more than 1 objects at once"]},
+        )
+
+    def test_sync(self):
+        User = example.documents.User
+        resp = self.app.post(
+            "/user/sync/",
+            data=json.dumps(
+                [
+                    {"email": "1@b.com", "first_name": "alan"},
+                    {"email": "2@b.com", "first_name": "liv"},
+                    {"email": "3@b.com", "first_name": "new"},
+                    {"email": "invalid"},
+                    {"first_name": "nokey"},
+                    {"email": "2@b.com"},
+                ]
+            ),
+        )
+        response_success(resp)
+        results = resp_json(resp)["results"]
+        new_user = User.objects.get(email="3@b.com")
+        self.assertEqual(
+            results,
+            [
+                {"status": "unchanged", "id": self.user_1_obj["id"]},
+                {"status": "updated", "id": self.user_2_obj["id"]},
+                {"status": "created", "id": str(new_user.pk)},
+                {
+                    "status": "error",
+                    "errors": {
+                        "field-errors": {"email": "Invalid email address."},
+                        "errors": [],
+                    },
+                },
+                {
+                    "status": "error",
+                    "errors": {"field-errors": {"email": "This field is required."}},
+                },
+                {
+                    "status": "error",
+                    "errors": {"field-errors": {"email": "Duplicate value."}},
+                },
+            ],
+        )
+        self.assertEqual(new_user.first_name, "new")
+        user_2 = User.objects.get(email="2@b.com")
+        self.assertEqual(user_2.first_name, "liv")
+        self.assertEqual(User.objects.get(email="1@b.com").last_name, "baker")
+
+        # Syncing the same records again doesn't write anything
+        resp = self.app.post(
+            "/user/sync/",
+            data=json.dumps(
+                [{"email": "2@b.com", "first_name": "liv"}, {"email": "3@b.com"}]
+            ),
+        )
+        response_success(resp)
+        self.assertEqual(
+            [result["status"] for result in resp_json(resp)["results"]],
+            ["unchanged", "unchanged"],
+        )
+
+        resp = self.app.post("/user/sync/", data=json.dumps({"email": "1@b.com"}))
+        response_error(resp, code=400)
+
+    def test_sync_read_permission(self):
+        User = example.documents.User
+        resp = self.app.post(
+            "/restricted_sync_users/sync/",
+            data=json.dumps(
+                [
+                    {"email": "1@b.com", "first_name": "anthony"},
+                    {"email": "2@b.com", "first_name": "liv"},
+                ]
+            ),
+        )
+        response_success(resp)
+        self.assertEqual(
+            resp_json(resp)["results"],
+            [
+                {"status": "updated", "id": self.user_1_obj["id"]},
+                {"status": "error", "errors": {"error": "Unauthorized"}},
+            ],
+        )
+
+        # Objects the view can't read are neither changed nor created again
+        self.assertEqual(User.objects.get(email="1@b.com").first_name, "anthony")
+        self.assertEqual(User.objects(email="2@b.com").count(), 1)
+        self.assertEqual(User.objects.get(email="2@b.com").first_name, "olivia")
+
+    def test_sync_validates_existing_objects(self):
+        user_id = self.user_1_obj["id"]
+        resp = self.app.post(
+            "/posts/",
+            data=json.dumps({"title": "a", "author_id": user_id, "is_published": True}),
+        )
+        response_success(resp)
+
+        # Like a PUT, items are validated against the existing object, so
+        # required fields can be left out...
+        resp = self.app.post(
+            f"/user/{user_id}/writable_posts/sync/",
+            data=json.dumps([{"title": "a"}, {"title": "b"}]),
+        )
+        response_success(resp)
+        results = resp_json(resp)["results"]
+        self.assertEqual(results[0]["status"], "unchanged")
+
+        # ...but not from new objects
+        self.assertEqual(
+            results[1],
+            {
+                "status": "error",
+                "errors": {
+                    "field-errors": {"is_published": "This field is required."},
+                    "errors": [],
+                },
+            },
+        )
+
+    def test_sync_key_must_be_a_field(self):
+        class InvalidSyncResource(Resource):
+            document = example.documents.User
+            sync_key = "invalid"
+
+        class InvalidSyncView(ResourceView):
+            resource = InvalidSyncResource
+            methods = [Sync]
+
+        api = MongoRest(Flask(__name__))
+        self.assertRaises(ValueError, api.register(), InvalidSyncView)
+
+    def test_bulk_delete(self):
+        documents = example.documents
+        documents.Activity.drop_collection()
+        users = [
+            documents.User.objects.create(email=email, datetime=datetime_value)
+            for email, datetime_value in [
+                ("3@b.com", datetime.datetime(2013, 1, 1)),
+                ("4@b.com", datetime.datetime(2013, 1, 1)),
+                ("5@b.com", datetime.datetime(2014, 1, 1)),
+            ]
+        ]
+        for user in users:
+            documents.Comment.objects.create(user=user, text="hi")
+
+        resp = self.app.delete("/limited_bulk_users/?datetime=2013-01-01T00:00:00")
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp),
+            {"errors": ["It's not allowed to delete more than 1 objects at once"]},
+        )
+        self.assertEqual(documents.User.objects.count(), 5)
+
+        # The delete rules are applied in bulk
+        resp = self.app.delete("/user/?datetime=2013-01-01T00:00:00")
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"count": 2})
+        self.assertEqual(documents.User.objects.count(), 3)
+        self.assertEqual(
+            [activity.user.pk for activity in documents.Activity.objects],
+            [users[2].pk],
+        )
+
+        # Unless they're disabled
+        resp = self.app.delete("/no_delete_rules_users/?datetime=2014-01-01T00:00:00")
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"count": 1})
+        self.assertEqual(documents.User.objects.count(), 2)
+        self.assertEqual(documents.Activity.objects.count(), 1)
+
+        # The view's delete permission applies to each object
+        for title, is_published in [("a", False), ("b", True)]:
+            documents.Post.objects.create(title=title, is_published=is_published)
+        resp = self.app.delete("/restricted/?title__in=a,b")
+        response_error(resp, code=401)
+        self.assertEqual(documents.Post.objects.count(), 2)
+        resp = self.app.delete("/restricted/?title=a")
+        response_success(resp)
+        self.assertEqual(resp_json(resp), {"count": 1})
+        self.assertEqual([post.title for post in documents.Post.objects], ["b"])
+
+    def test_nested_view(self):
+        user_1_id, user_2_id = self.user_1_obj["id"], self.user_2_obj["id"]
+        post_ids = {}
+        for author_id, title in [(user_1_id, "a"), (user_1_id, "b"), (user_2_id, "c")]:
+            resp = self.app.post(
+                "/posts/",
+                data=json.dumps(
+                    {"title": title, "author_id": author_id, "is_published": True}
+                ),
+            )
+            response_success(resp)
+            post_ids[title] = resp_json(resp)["id"]
+
+        resp = self.app.get(f"/user/{user_1_id}/posts/")
+        response_success(resp)
+        self.assertEqual(
+            sorted(post["title"] for post in resp_json(resp)["data"]), ["a", "b"]
+        )
+
+        # Other filters still apply
+        resp = self.app.get(f"/user/{user_1_id}/posts/?title=b")
+        response_success(resp)
+        self.assertEqual([post["title"] for post in resp_json(resp)["data"]], ["b"])
+
+        resp = self.app.get(f"/user/{user_1_id}/posts/{post_ids['a']}/")
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["title"], "a")
+
+        # Objects of other parents aren't found
+        resp = self.app.get(f"/user/{user_1_id}/posts/{post_ids['c']}/")
+        response_error(resp, code=404)
+
+        # Nor are the children of unknown parents
+        resp = self.app.get(f"/user/{ObjectId()}/posts/")
+        response_error(resp, code=404)
+        resp = self.app.get("/user/invalid/posts/")
+        response_error(resp, code=404)
+
+        # Created objects belong to the parent
+        url = f"/user/{user_1_id}/writable_posts/"
+        resp = self.app.post(
+            url, data=json.dumps({"title": "d", "is_published": False})
+        )
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["author_id"], user_1_id)
+        resp = self.app.post(
+            url,
+            data=json.dumps(
+                [
+                    {"title": "e", "is_published": False},
+                    {"title": "f", "is_published": False},
+                ]
+            ),
+        )
+        response_success(resp)
+        self.assertEqual(
+            [
+                str(post.author.pk)
+                for post in example.documents.Post.objects(title__in=["e", "f"])
+            ],
+            [user_1_id, user_1_id],
+        )
+
+        # They can't be created under or moved to another parent
+        resp = self.app.post(
+            url,
+            data=json.dumps(
+                {"title": "g", "is_published": False, "author_id": user_2_id}
+            ),
+        )
+        response_error(resp, code=400)
+        self.assertEqual(
+            resp_json(resp)["field-errors"], {"author_id": "Must be the parent object."}
+        )
+        resp = self.app.put(
+            f"{url}{post_ids['a']}/", data=json.dumps({"author_id": user_2_id})
+        )
+        response_error(resp, code=400)
+
+        # Synced keys of another parent's objects aren't created again
+        resp = self.app.post(
+            f"{url}sync/", data=json.dumps([{"title": "a"}, {"title": "c"}])
+        )
+        response_success(resp)
+        results = resp_json(resp)["results"]
+        self.assertEqual(results[0]["status"], "unchanged")
+        self.assertEqual(
+            results[1],
+            {
+                "status": "error",
+                "errors": {"field-errors": {"title": "Belongs to another parent."}},
+            },
+        )
+        self.assertEqual(example.documents.Post.objects(title="c").count(), 1)
+
+    def test_batch(self):
+        user_1_id = self.user_1_obj["id"]
+        sub_requests = [
+            {"path": f"/user/{user_1_id}/"},
+            {"method": "GET", "path": "/user/", "params": {"_limit": 1}},
+            {"method": "POST", "path": "/user/", "body": {"email": "invalid"}},
+            {
+                "method": "PUT",
+                "path": f"/user/{user_1_id}/",
+                "body": {"first_name": "X"},
+            },
+            {"path": f"/user/{user_1_id}/"},
+            {"path": "/auth/"},
+            {"path": "/nonexistent/"},
+            {"method": "POST", "path": "/batch/", "body": []},
+        ]
+        resp = self.app.post("/batch/", data=json.dumps(sub_requests))
+        response_success(resp)
+        responses = resp_json(resp)["responses"]
+        self.assertEqual(
+            [r["status"] for r in responses], [200, 200, 400, 200, 200, 401, 404, 404]
+        )
+        self.assertEqual(responses[0]["body"]["id"], user_1_id)
+        self.assertEqual(len(responses[1]["body"]["data"]), 1)
+        self.assertTrue(responses[1]["body"]["has_more"])
+        self.assertIn("field-errors", responses[2]["body"])
+        # Reads after a write see its changes
+        self.assertEqual(responses[4]["body"]["first_name"], "X")
+
+        # Identical reads run once, and concurrently with an executor
+        with query_counter() as c:
+            resp = self.app.post(
+                "/concurrent_batch/",
+                data=json.dumps(
+                    [
+                        {"path": f"/user/{user_1_id}/"},
+                        {"path": f"/user/{user_1_id}/"},
+                        {"path": "/user/", "params": {"_limit": 1}},
+                    ]
+                ),
+            )
+            self.assertEqual(c, 2)
+        response_success(resp)
+        responses = resp_json(resp)["responses"]
+        self.assertEqual(responses[0], responses[1])
+        self.assertEqual(responses[2]["body"]["data"][0]["id"], user_1_id)
+
+        resp = self.app.post("/batch/", data=json.dumps([{"path": "/user/"}] * 11))
+        response_error(resp, code=400)
+        resp = self.app.post("/batch/", data=json.dumps({"path": "/user/"}))
+        response_error(resp, code=400)
+        resp = self.app.post("/batch/", data=json.dumps([{"path": "user"}]))
+        response_success(resp)
+        self.assertEqual(resp_json(resp)["responses"][0]["status"], 400)
+
+    def test_batch_contexts(self):
+        # Sub-requests don't share `g`
+        resp = self.app.post(
+            "/batch/",
+            data=json.dumps(
+                [
+                    {"path": "/batch_users/", "params": {"_limit": 1}},
+                    {"path": "/batch_users/", "params": {"_limit": 2}},
+                ]
+            ),
+        )
+        response_success(resp)
+        responses = resp_json(resp)["responses"]
+        self.assertEqual([r["body"]["requests"] for r in responses], [1, 1])
+
+    def test_batch_timeout(self):
+        resp = self.app.post(
+            "/concurrent_batch/",
+            data=json.dumps(
+                [
+                    {"path": "/batch_users/", "params": {"sleep": 1}},
+                    {"path": "/batch_users/"},
+                ]
+            ),
+        )
+        response_success(resp)
+        responses = resp_json(resp)["responses"]
+        self.assertEqual([r["status"] for r in responses], [504, 200])
+        self.assertEqual(
+            responses[0]["body"], {"error": "The request exceeded its time budget."}
+        )
+
+    def test_batch_errors(self):
+        resp = self.app.post(
+            "/batch/",
+            data=json.dumps(
+                [
+                    {"path": "/user/?_limit=1", "params": {"_skip": 1}},
+                    {"path": f"/failing_users/{self.user_1_obj['id']}/"},
+                    {"path": "/user/?_limit=1"},
+                ]
+            ),
+        )
+        response_success(resp)
+        responses = resp_json(resp)["responses"]
+        self.assertEqual([r["status"] for r in responses], [400, 500, 200])
+        self.assertEqual(responses[1]["body"], {"error": "Internal Server Error"})
+        self.assertEqual(len(responses[2]["body"]["data"]), 1)
+
+    def test_query_stats(self):
+        query_stats = example.StatsPostResource.query_stats
+        # Without a file or collection, flushing only starts from scratch
+        query_stats.flush()
+        for url in [
+            "/stats_posts/?title__in=a,b&_limit=20",
+            "/stats_posts/?title__in=c&_limit=15",
+            "/stats_posts/?title=a&is_published=true",
+        ]:
+            response_success(self.app.get(url))
+
+        stats = query_stats.snapshot()
+        self.assertEqual(
+            set(stats),
+            {
+                "StatsPostResource title:in limit<=25",
+                "StatsPostResource is_published:exact title:exact limit<=100",
+            },
+        )
+        self.assertEqual(stats["StatsPostResource title:in limit<=25"]["count"], 2)
+
+        query_stats.flush()
+        self.assertEqual(query_stats.snapshot(), {})
+        rows = [dict(entry, shape=shape) for shape, entry in stats.items()]
+        self.assertEqual(
+            [shape for shape, entry in top_shapes(rows, top=1)],
+            [max(stats, key=lambda shape: stats[shape]["total_ms"])],
+        )
+
+    def test_query_stats_background_flush(self):
+        path = os.path.join(tempfile.mkdtemp(), "query_shapes.jsonl")
+        stats = QueryShapeStats(path=path, flush_interval=0)
+        stats.record("PostResource title:exact", 1.0, 1)
+
+        # Recording doesn't wait for the flush, which runs in a thread
+        stats._flush_thread.join()
+        self.assertEqual(stats.snapshot(), {})
+        with open(path) as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(
+            [(row["shape"], row["count"]) for row in rows],
+            [("PostResource title:exact", 1)],
+        )
+
     def test_bulk_update_limit(self):
         """
         Make sure that the limit on the number of objects that can be
@@ -1248,6 +2557,63 @@ class MongoRestSchemaTestCase(unittest.TestCase):
         )
         response_error(resp)
 
+    def test_bulk_save_related(self):
+        documents = example.documents
+        writes = example.BulkPersonResource.writes
+        del writes[:]
+
+        # New related objects are inserted with one bulk_write
+        resp = self.app.post(
+            "/bulk_person/",
+            data=json.dumps(
+                {"name": "John", "languages": [{"name": "A"}, {"name": "B"}]}
+            ),
+        )
+        response_success(resp)
+        self.assertEqual(writes, [["InsertOne", "InsertOne"]])
+        person_id = resp_json(resp)["id"]
+        a_id, b_id = [language["id"] for language in resp_json(resp)["languages"]]
+
+        # Unchanged related objects are skipped
+        del writes[:]
+        resp = self.app.put(
+            f"/bulk_person/{person_id}/",
+            data=json.dumps({"languages": [{"id": a_id}, {"id": b_id, "name": "C"}]}),
+        )
+        response_success(resp)
+        self.assertEqual(writes, [["UpdateOne"]])
+        self.assertEqual(
+            [language.name for language in documents.Language.objects], ["A", "C"]
+        )
+
+        # New documents with a primary key are upserted, like Document.save
+        # does
+        del writes[:]
+        with example.app.test_request_context("/"):
+            example.BulkPersonResource().bulk_save_objects(
+                [documents.Language(id=ObjectId(a_id), name="D")]
+            )
+        self.assertEqual(writes, [["ReplaceOne"]])
+        self.assertEqual(
+            [language.name for language in documents.Language.objects], ["D", "C"]
+        )
+
+        # Related resources with custom save logic save objects one by one
+        del writes[:]
+        saved = example.SavingLanguageResource.saved
+        del saved[:]
+        resp = self.app.put(
+            f"/saving_bulk_person/{person_id}/",
+            data=json.dumps({"languages": [{"id": a_id, "name": "E"}, {"name": "F"}]}),
+        )
+        response_success(resp)
+        self.assertEqual(saved, ["E", "F"])
+        self.assertEqual(writes, [])
+        self.assertEqual(
+            [language.name for language in documents.Language.objects],
+            ["E", "C", "F"],
+        )
+
     def test_datetime(self):
         resp = self.app.post(
             "/datetime/", data=json.dumps({"datetime": "2010-01-01T00:00:00"})
@@ -1370,6 +2736,214 @@ class InternalTestCase(unittest.TestCase):
         result = serialize_mongoengine_validation_error(error)
         self.assertEqual(result, {"field-errors": {"a": "Invalid value"}})
 
+    def test_reference_comparator(self):
+        documents = example.documents
+        compare = field_comparator(documents.Post._fields["author"])
+        user = documents.User(id=ObjectId())
+        self.assertTrue(compare(user.pk, user))
+        self.assertTrue(compare(None, None))
+
+        # Unsaved documents have no id, but aren't the same as no reference
+        unsaved_user = documents.User(email="new@b.com")
+        self.assertFalse(compare(None, unsaved_user))
+        self.assertFalse(compare(unsaved_user, None))
+        self.assertFalse(compare(unsaved_user, documents.User()))
+        self.assertTrue(compare(unsaved_user, unsaved_user))
+
+        post = documents.Post(title="a")
+        resource = example.PostResource()
+        resource._raw_data = {"author_id": None}
+        resource.update_object(post, data={"author": unsaved_user}, save=False)
+        self.assertEqual(resource._dirty_fields, ["author"])
+        self.assertIs(post.author, unsaved_user)
+
+    def test_query_value_coercer(self):
+        # Comparison values of plain string fields are used as is...
+        coerce = query_value_coercer(StringField())
+        self.assertEqual(coerce("ne", "a"), "a")
+        self.assertEqual(coerce("startswith", "a."), re.compile(r"^a\."))
+
+        # ...but subclasses still prepare them
+        field = EmailField()
+        self.assertEqual(query_value_coercer(field), field.prepare_query_value)
+
+    def test_filter_table(self):
+        resource = example.PostResource()
+        table, prefixes = resource._filter_table, resource._filter_prefixes
+        self.assertEqual(prefixes, {"title", "author_id", "is_published"})
+
+        field, operator, negate = table["author_id"]
+        self.assertEqual((field, negate), ("author", False))
+        self.assertIsInstance(operator, ops.Exact)
+
+        field, operator, negate = table["title__not__in"]
+        self.assertEqual((field, negate), ("title", True))
+        self.assertIsInstance(operator, ops.In)
+
+        # Negation is only compiled for operators which allow it.
+        self.assertNotIn("title__not__startswith", table)
+        self.assertIn("title__startswith", table)
+
+        # The table is shared by all instances of the resource class.
+        self.assertIs(example.PostResource()._filter_table, table)
+
+        # Lookup paths fall back to parsing the key.
+        field, operator, negate = resource._parse_filter_key("title__foo__not__in")
+        self.assertEqual((field, negate), ("title__foo", True))
+        self.assertIsNone(resource._parse_filter_key("titles"))
+
+    def test_raw_query_filters(self):
+        author_id = ObjectId()
+        resource = example.PostResource()
+        qs = resource.apply_filters(
+            example.documents.Post.objects,
+            {
+                "title__not__in": "a,b",
+                "title__startswith": "a.",
+                "author_id": str(author_id),
+                "is_published": "false",
+                "unknown": "value",
+            },
+        )
+        self.assertEqual(
+            qs._query,
+            {
+                "title": {"$nin": ["a", "b"]},
+                "$and": [{"title": re.compile(r"^a\.")}],
+                "author": author_id,
+                "is_published": False,
+            },
+        )
+
+        # Values which can't be converted are left to MongoEngine
+        qs = resource.apply_filters(
+            example.documents.Post.objects, {"author_id": "garbage"}
+        )
+        self.assertRaises(ValidationError, lambda: qs._query)
+
+    def test_collation_filters(self):
+        class UserResource(Resource):
+            document = example.documents.User
+            filters = {
+                "first_name": [
+                    ops.CollatedIExact(index="first_name_ci"),
+                    ops.CollatedIStartswith(allow_negation=True),
+                ],
+                "last_name": [ops.CollatedIExact(collation={"locale": "fr"})],
+                "email": [ops.Search(order_by_score=True), ops.Exact, ops.Contains],
+                "balance": [ops.Gt],
+            }
+            allowed_ordering = ["email", "balance"]
+
+        resource = UserResource()
+        qs = resource.apply_filters(
+            example.documents.User.objects,
+            {"first_name__iexact": "Alan", "first_name__not__istartswith": "Al"},
+        )
+        self.assertEqual(
+            qs._query,
+            {
+                "first_name": "Alan",
+                "$and": [{"first_name": {"$not": {"$gte": "Al", "$lt": "Al\uffff"}}}],
+            },
+        )
+        self.assertEqual(qs._collation, ops.CASE_INSENSITIVE_COLLATION)
+        self.assertEqual(qs._hint, "first_name_ci")
+
+        # A query can only use a single collation
+        self.assertRaises(
+            RestValidationError,
+            resource.apply_filters,
+            example.documents.User.objects,
+            {"first_name__iexact": "alan", "last_name__iexact": "baker"},
+        )
+
+        # The collation would apply to other string comparisons and to the
+        # sort as well
+        self.assertRaises(
+            RestValidationError,
+            resource.apply_filters,
+            example.documents.User.objects,
+            {"first_name__iexact": "alan", "email": "1@b.com"},
+        )
+        params = {
+            "first_name__iexact": "alan",
+            "email__contains": "b.com",
+            "balance__gt": "10",
+        }
+        qs = resource.apply_filters(example.documents.User.objects, params)
+        self.assertEqual(qs._collation, ops.CASE_INSENSITIVE_COLLATION)
+        self.assertRaises(
+            RestValidationError,
+            resource.apply_ordering,
+            qs,
+            dict(params, _order_by="email"),
+        )
+        qs = resource.apply_ordering(qs, dict(params, _order_by="balance"))
+        self.assertEqual(qs._ordering, [("balance", 1)])
+
+        # The same goes for the conditions and the ordering of the queryset
+        # the filters are applied to, e.g. a restricted view's permission
+        class RestrictedUserView(ResourceView):
+            resource = UserResource
+            methods = [example.List]
+
+            def has_read_permission(self, request, qs):
+                return qs.filter(last_name="baker")
+
+        with example.app.test_request_context("/?first_name__iexact=alan"):
+            view = RestrictedUserView()
+            self.assertRaises(
+                RestValidationError,
+                UserResource(view_method=example.List).get_objects,
+                qfilter=lambda qs: view.has_read_permission(request, qs.clone()),
+            )
+        qs = resource.apply_filters(
+            example.documents.User.objects(balance__gt=10),
+            {"first_name__iexact": "alan"},
+        )
+        self.assertEqual(qs._collation, ops.CASE_INSENSITIVE_COLLATION)
+        self.assertRaises(
+            RestValidationError, resource.apply_ordering, qs.order_by("last_name"), {}
+        )
+
+        qs = resource.apply_filters(
+            example.documents.User.objects, {"email__search": "baker"}
+        )
+        self.assertEqual(qs._query, {"$text": {"$search": "baker"}})
+        self.assertEqual(qs._ordering, [("_text_score", {"$meta": "textScore"})])
+
+    def test_run_concurrently(self):
+        executor = ThreadPoolExecutor(max_workers=2)
+
+        class ConcurrentPostResource(example.PostResource):
+            related_resources_executor = executor
+            max_time_ms = 500
+
+        with example.app.test_request_context("/?_skip=1"):
+            resource = ConcurrentPostResource()
+
+            # Both tasks only return if they run at the same time, and they
+            # have access to the request.
+            barrier = threading.Barrier(2, timeout=1)
+
+            def task():
+                barrier.wait()
+                return request.args["_skip"]
+
+            self.assertEqual(resource.run_concurrently([task, task]), ["1", "1"])
+
+            # Stop waiting once the time budget runs out
+            done = threading.Event()
+            self.assertRaises(
+                QueryTimeout,
+                resource.run_concurrently,
+                [lambda: done.wait(5), lambda: None],
+            )
+            done.set()
+
+        executor.shutdown()
+
 
 if __name__ == "__main__":
     unittest.main()